@@ -0,0 +1,224 @@
+"""
+Admission control for MCP tool calls.
+
+Every tool call needs a slot before it runs. At most ADMISSION_GLOBAL_LIMIT
+calls run at once in this process, and at most ADMISSION_SESSION_LIMIT of
+them for one client (see session_key). A call that cannot start waits
+in a bounded queue. Queued calls have two lanes: interactive tools are
+granted before the batch tools in ADMISSION_BATCH_TOOLS, so a sweep cannot
+starve the agents answering customers.
+
+Calls are shed with a ToolError rather than left to wait forever:
+
+    queue_full   the queue already holds ADMISSION_QUEUE_SIZE calls (an
+                 interactive call displaces the newest batch call instead,
+                 which is then shed with reason displaced)
+    deadline     the expected wait, from the queue ahead and the recent mean
+                 run time, is beyond ADMISSION_QUEUE_TIMEOUT
+    timeout      the call waited ADMISSION_QUEUE_TIMEOUT without a slot
+
+A limit of 0 disables that cap.
+
+Who counts as one client. With the stateful main.py server every client has
+an mcp-session-id, and the cap is per MCP session. The stateless asgi.py app
+(the Procfile default) issues no session ids, so the cap is per caller
+identity instead:
+
+    1. the ADMISSION_IDENTITY_HEADER header (Authorization by default), hashed,
+       so agents sharing an egress IP but using their own API keys get their
+       own caps
+    2. otherwise the client address: the X-Forwarded-For entry appended by
+       our own proxies (the last ADMISSION_TRUSTED_PROXY_HOPS entries, 1 for
+       Heroku's router), never the first hop, which the client writes itself.
+       Set the hops to 0 when nothing proxies the app.
+
+The identity header is only as trustworthy as whatever checks it in front of
+the app; a client rotating it gets past the per-client cap but is still held
+to the global cap and the queue.
+"""
+import os
+import time
+import hashlib
+import asyncio
+from collections import deque
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_http_request
+from fastmcp.server.middleware import Middleware as MCPMiddleware
+import metrics
+
+GLOBAL_LIMIT = int(os.getenv("ADMISSION_GLOBAL_LIMIT", "16"))
+SESSION_LIMIT = int(os.getenv("ADMISSION_SESSION_LIMIT", "4"))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+IDENTITY_HEADER = os.getenv("ADMISSION_IDENTITY_HEADER", "authorization").lower()
+TRUSTED_PROXY_HOPS = int(os.getenv("ADMISSION_TRUSTED_PROXY_HOPS", "1"))
+BATCH_TOOLS = frozenset(
+    name.strip()
+    for name in os.getenv("ADMISSION_BATCH_TOOLS", "get_orders_eligibility_batch,search_orders_by_email").split(",")
+    if name.strip()
+)
+
+LANES = ("interactive", "batch")
+
+
+class Waiter:
+    def __init__(self, session, lane):
+        self.session = session
+        self.lane = lane
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    def __init__(self, global_limit=GLOBAL_LIMIT, session_limit=SESSION_LIMIT, queue_size=QUEUE_SIZE,
+                 queue_timeout=QUEUE_TIMEOUT):
+        self.global_limit = global_limit
+        self.session_limit = session_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.sessions = {}
+        self.queues = {lane: deque() for lane in LANES}
+        # Recent mean run time of a call, for the expected-wait estimate
+        self.mean_run_time = 0.5
+
+    def queued(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _has_room(self, session):
+        return ((not self.global_limit or self.running < self.global_limit)
+                and (not self.session_limit or self.sessions.get(session, 0) < self.session_limit))
+
+    def _start(self, session):
+        self.running += 1
+        self.sessions[session] = self.sessions.get(session, 0) + 1
+
+    def _dispatch(self):
+        """Grant slots to queued calls, interactive lane first, skipping sessions at their cap."""
+        for lane in LANES:
+            queue = self.queues[lane]
+            for waiter in list(queue):
+                if self.global_limit and self.running >= self.global_limit:
+                    return
+                if waiter.future.done():
+                    queue.remove(waiter)
+                elif self._has_room(waiter.session):
+                    queue.remove(waiter)
+                    self._start(waiter.session)
+                    waiter.future.set_result(True)
+
+    def _expected_wait(self, lane):
+        ahead = len(self.queues["interactive"]) + (len(self.queues["batch"]) if lane == "batch" else 0)
+        return (ahead + 1) * self.mean_run_time / (self.global_limit or 1)
+
+    def _reject(self, lane, reason, detail):
+        metrics.admission_rejected.inc(lane=lane, reason=reason)
+        raise ToolError(f"Server busy ({detail}); retry in a few seconds.")
+
+    async def acquire(self, session, lane):
+        """Wait for a slot; raise ToolError when the call is shed. Pair with release(session, run_time)."""
+        ahead = len(self.queues["interactive"]) if lane == "interactive" else self.queued()
+        if not ahead and self._has_room(session):
+            self._start(session)
+            metrics.admission_wait.observe(0, lane=lane)
+            return
+        if self.queue_size and self.queued() >= self.queue_size:
+            if lane == "interactive" and self.queues["batch"]:
+                displaced = self.queues["batch"].pop()
+                displaced.future.set_exception(ToolError("Server busy (displaced by interactive calls); retry later."))
+                metrics.admission_rejected.inc(lane="batch", reason="displaced")
+            else:
+                self._reject(lane, "queue_full", f"{self.queued()} calls queued")
+        if self.global_limit and self._expected_wait(lane) > self.queue_timeout:
+            self._reject(lane, "deadline", f"expected wait {self._expected_wait(lane):.1f}s")
+
+        waiter = Waiter(session, lane)
+        self.queues[lane].append(waiter)
+        self._dispatch()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None):
+                waiter.future.cancel()
+                self._reject(lane, "timeout", f"no slot within {self.queue_timeout:g}s")
+        except asyncio.CancelledError:
+            # The client went away; hand the slot on if it was granted meanwhile
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release(session)
+            else:
+                waiter.future.cancel()
+            raise
+        finally:
+            if waiter in self.queues[lane]:
+                self.queues[lane].remove(waiter)
+            metrics.admission_wait.observe(time.monotonic() - start, lane=lane)
+
+    def release(self, session, run_time=None):
+        self.running -= 1
+        count = self.sessions.get(session, 1) - 1
+        if count:
+            self.sessions[session] = count
+        else:
+            self.sessions.pop(session, None)
+        if run_time is not None:
+            self.mean_run_time += 0.1 * (run_time - self.mean_run_time)
+        self._dispatch()
+
+
+def client_address(request, trusted_hops=TRUSTED_PROXY_HOPS):
+    """
+    The address that connected to our outermost trusted proxy. Each proxy
+    appends the peer it saw to X-Forwarded-For, so that is the entry
+    trusted_hops from the end; anything before it is whatever the client sent.
+    request.client.host is not used behind a proxy: with forwarded_allow_ips="*"
+    uvicorn fills it from the first, client-written entry.
+    """
+    forwarded = [host.strip() for host in request.headers.get("x-forwarded-for", "").split(",") if host.strip()]
+    if trusted_hops and forwarded:
+        return forwarded[-min(trusted_hops, len(forwarded))]
+    return request.client.host if request.client else "local"
+
+
+def session_key(context):
+    """The client a tool call counts against: MCP session, identity header or address (see module docstring)."""
+    try:
+        request = get_http_request()
+    except RuntimeError:
+        return "local"
+    session_id = request.headers.get("mcp-session-id")
+    if session_id:
+        return f"session:{session_id}"
+    identity = request.headers.get(IDENTITY_HEADER)
+    if identity:
+        return "identity:" + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+    return f"address:{client_address(request)}"
+
+
+class AdmissionMiddleware(MCPMiddleware):
+    """Runs every tool call through an AdmissionController."""
+
+    def __init__(self, controller=None):
+        self.controller = controller if controller is not None else default_controller
+
+    async def on_call_tool(self, context, call_next):
+        lane = "batch" if context.message.name in BATCH_TOOLS else "interactive"
+        session = session_key(context)
+        await self.controller.acquire(session, lane)
+        start = time.monotonic()
+        try:
+            return await call_next(context)
+        finally:
+            self.controller.release(session, time.monotonic() - start)
+
+
+default_controller = AdmissionController()
+
+
+@metrics.register_collector
+def _admission_samples():
+    controller = default_controller
+    samples = [("mcp_admission_running", "gauge", "Tool calls holding an admission slot", {}, controller.running)]
+    for lane in LANES:
+        samples.append(("mcp_admission_queue_depth", "gauge", "Tool calls waiting for an admission slot",
+                        {"lane": lane}, len(controller.queues[lane])))
+    return samples
@@ -0,0 +1,33 @@
+"""
+ASGI entry point for multi-worker serving (see serve.py).
+
+Sessions are stateless: every MCP request carries everything it needs and no
+mcp-session-id is bound to a process, so any worker can answer any request
+and nothing has to be shared between them. Each response is an SSE stream
+that closes with the result, so progress notifications (ctx.report_progress in
+the batch and search tools) reach the client. MCP_JSON_RESPONSE=1 answers with
+plain JSON instead, which is a little cheaper but drops those notifications.
+"""
+import os
+from contextlib import asynccontextmanager
+from main import mcp, cors_middleware
+from shopify_client import close_client
+
+JSON_RESPONSE = os.getenv("MCP_JSON_RESPONSE", "0") == "1"
+
+app = mcp.http_app(stateless_http=True, json_response=JSON_RESPONSE, middleware=[cors_middleware])
+
+_mcp_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async with _mcp_lifespan(app) as state:
+        try:
+            yield state
+        finally:
+            # Runs after uvicorn has drained in-flight requests
+            await close_client()
+
+
+app.router.lifespan_context = lifespan
@@ -0,0 +1,219 @@
+import os
+import json
+import asyncio
+import argparse
+import httpx
+from graphql_backend import graphql_query, GraphQLError
+from order_index import get_index
+
+POLL_INTERVAL = float(os.getenv("BULK_POLL_INTERVAL", "5"))
+BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+CHECKPOINT_PATH = os.getenv("BULK_CHECKPOINT_PATH", "bulk_backfill.checkpoint.json")
+
+# The summary view of every order (ORDER_SUMMARY_FIELDS plus customer, country
+# and line item ids). Line prices, properties, discounts, fulfillments and
+# refunds are left out, since bulk queries cannot nest connections inside list
+# fields, so these records are stored as summary rows (see OrderIndex) and the
+# full-order readers keep going to the Admin API for them.
+ORDERS_BULK_QUERY = """
+{
+  orders {
+    edges {
+      node {
+        id
+        name
+        email
+        createdAt
+        updatedAt
+        processedAt
+        cancelledAt
+        displayFinancialStatus
+        displayFulfillmentStatus
+        tags
+        currencyCode
+        totalPriceSet { shopMoney { amount } }
+        customer { id }
+        shippingAddress { countryCodeV2 }
+        lineItems {
+          edges {
+            node { id name sku quantity currentQuantity variant { id } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+RUN_MUTATION = """
+mutation RunBulk($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+POLL_QUERY = """
+query BulkStatus($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation { id status errorCode objectCount url }
+  }
+}
+"""
+
+
+def _legacy_id(gid):
+    return int(str(gid).rsplit("/", 1)[-1]) if gid else None
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+async def start_bulk_operation(query=ORDERS_BULK_QUERY):
+    data = await graphql_query(RUN_MUTATION, {"query": query})
+    result = data["bulkOperationRunQuery"]
+    if result["userErrors"]:
+        raise GraphQLError("; ".join(e["message"] for e in result["userErrors"]))
+    return result["bulkOperation"]["id"]
+
+
+async def wait_for_bulk_operation(operation_id, poll_interval=POLL_INTERVAL):
+    """Poll until the operation finishes. Returns the result URL (None when there were no objects)."""
+    while True:
+        operation = (await graphql_query(POLL_QUERY, {"id": operation_id}))["node"]
+        status = operation["status"]
+        if status == "COMPLETED":
+            print(f"bulk operation {operation_id} completed with {operation['objectCount']} objects")
+            return operation["url"]
+        if status in ("FAILED", "CANCELED", "EXPIRED"):
+            raise GraphQLError(f"bulk operation {operation_id} {status.lower()}: {operation.get('errorCode')}")
+        await asyncio.sleep(poll_interval)
+
+
+async def iter_lines(url, skip=0):
+    """Stream the result file line by line, skipping the first `skip` lines. Yields (line_no, line)."""
+    # The result URL is pre-signed storage, so it is fetched without the Admin API token
+    async with httpx.AsyncClient(timeout=None) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            line_no = 0
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                if line_no >= skip:
+                    yield line_no, line
+                line_no += 1
+
+
+def map_order(node, line_items):
+    """Map a bulk order record into the REST field names of ORDER_SUMMARY_FIELDS, plus customer and line items."""
+    return {
+        "id": _legacy_id(node["id"]),
+        "name": node["name"],
+        "email": node.get("email"),
+        "created_at": node.get("createdAt"),
+        "updated_at": node.get("updatedAt"),
+        "processed_at": node.get("processedAt"),
+        "cancelled_at": node.get("cancelledAt"),
+        "financial_status": (node.get("displayFinancialStatus") or "").lower() or None,
+        "fulfillment_status": (node.get("displayFulfillmentStatus") or "").lower() or None,
+        "tags": ", ".join(node.get("tags") or []),
+        "currency": node.get("currencyCode"),
+        "total_price": ((node.get("totalPriceSet") or {}).get("shopMoney") or {}).get("amount"),
+        "customer": {"id": _legacy_id(node["customer"]["id"])} if node.get("customer") else None,
+        "shipping_address": {"country_code": node["shippingAddress"]["countryCodeV2"]} if node.get("shippingAddress") else None,
+        "line_items": [
+            {
+                "id": _legacy_id(item["id"]),
+                "name": item["name"],
+                "sku": item.get("sku"),
+                "quantity": item["quantity"],
+                "current_quantity": item.get("currentQuantity"),
+                "variant_id": _legacy_id((item.get("variant") or {}).get("id")),
+            }
+            for item in line_items
+        ],
+    }
+
+
+async def assemble_orders(lines):
+    """
+    Group JSONL records into orders. Child records (line items) carry
+    __parentId and follow their parent, so an order is complete as soon as
+    the next top-level record starts. Yields (first_line_no, order); only one
+    order is held in memory at a time.
+    """
+    current, children, start = None, [], 0
+    async for line_no, line in lines:
+        record = json.loads(line)
+        if "__parentId" in record:
+            children.append(record)
+            continue
+        if current is not None:
+            yield start, map_order(current, children)
+        current, children, start = record, [], line_no
+    if current is not None:
+        yield start, map_order(current, children)
+
+
+async def batched(orders, size=BATCH_SIZE):
+    """Yield (next_line_no, batch) where next_line_no is where a resume should start."""
+    batch = []
+    async for start, order in orders:
+        if len(batch) >= size:
+            yield start, batch
+            batch = []
+        batch.append(order)
+    if batch:
+        yield None, batch
+
+
+async def run_backfill(index, checkpoint_path=CHECKPOINT_PATH, resume=True, batch_size=BATCH_SIZE,
+                       poll_interval=POLL_INTERVAL):
+    """
+    Run (or resume) a bulk export of all orders into the order index as
+    summary rows. The checkpoint records the bulk operation and how many
+    result lines are safely stored, so an interrupted run restarts from the
+    last batch.
+    """
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is None:
+        checkpoint = {"operation_id": await start_bulk_operation(), "lines_done": 0, "orders_done": 0}
+        save_checkpoint(checkpoint_path, checkpoint)
+    # The result URL expires, so it is always refreshed from the operation
+    url = await wait_for_bulk_operation(checkpoint["operation_id"], poll_interval)
+    if url:
+        lines = iter_lines(url, skip=checkpoint["lines_done"])
+        async for next_line, batch in batched(assemble_orders(lines), batch_size):
+            index.upsert_orders(batch, complete=False)
+            checkpoint["orders_done"] += len(batch)
+            if next_line is not None:
+                checkpoint["lines_done"] = next_line
+                save_checkpoint(checkpoint_path, checkpoint)
+                print(f"stored {checkpoint['orders_done']} orders")
+    os.remove(checkpoint_path)
+    return checkpoint["orders_done"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the order index with a Shopify bulk operation")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+    index = get_index()
+    if index is None:
+        raise SystemExit("ORDER_INDEX_PATH is not set")
+    total = asyncio.run(run_backfill(index, args.checkpoint, resume=not args.restart))
+    print(f"backfill complete: {total} orders, index holds {index.count()}")
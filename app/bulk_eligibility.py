@@ -0,0 +1,146 @@
+import sys
+import numpy as np
+import pandas as pd
+from tools import get_payment_method, index_deliveries, index_refunds, line_item_discount
+from policy import get_policy
+
+COLUMNS = [
+    "order_id", "order_name", "line_item_id", "sku", "quantity", "paid_price",
+    "is_final_sale", "delivered_at", "discount_pct", "has_discount",
+    "payment_method", "country_code", "was_returned", "compare_at_price",
+]
+
+
+def flatten_orders(orders, variant_prices=None):
+    """
+    Flatten REST order dicts into one row per returnable line item with the
+    inputs get_eligibility needs. The per-order lookups are the same ones
+    process_order_items uses. variant_prices ({variant_id: (price, compare_at_price)},
+    as from async_get_variant_prices_batch) fills compare_at_price; without it
+    compare-at markdowns are not detected, as in process_order_items.
+    """
+    variant_prices = variant_prices or {}
+    rows = []
+    for order in orders:
+        delivered = index_deliveries(order.get("fulfillments", []))
+        refunded = index_refunds(order.get("refunds", []))
+        payment_method = get_payment_method(order)
+        country_code = (order.get("shipping_address") or {}).get("country_code")
+        for item in order.get("line_items", []):
+            if not item.get("current_quantity", 0) > 0:
+                continue
+            properties = item.get("properties", [])
+            _, discount_pct, has_discount = line_item_discount(properties)
+            rows.append((
+                order["id"], order.get("name"), item["id"], item.get("sku"), item["quantity"],
+                float(item.get("price", 0)),
+                any(p['value'] == "Final Sale" for p in properties),
+                delivered.get(item["id"]),
+                discount_pct, has_discount, payment_method, country_code,
+                item["id"] in refunded,
+                variant_prices.get(item.get("variant_id"), (None, 0))[1],
+            ))
+    return pd.DataFrame.from_records(rows, columns=COLUMNS)
+
+
+def compute_days_held(delivered_at, now=None):
+    """Whole days since delivery as a float Series, NaN where not delivered."""
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    delivered = pd.to_datetime(pd.Series(delivered_at, dtype="object"), utc=True, format="ISO8601")
+    return (now - delivered).dt.days.astype("float64")
+
+
+def _rule_mask(conditions, is_final_sale, days_held, discount_pct, has_discount, payment_method):
+    mask = np.ones(len(is_final_sale), dtype=bool)
+    for key, value in conditions.items():
+        if key == "final_sale":
+            mask &= is_final_sale == value
+        elif key == "has_discount":
+            mask &= has_discount == value
+        elif key == "days_held_gt":
+            with np.errstate(invalid="ignore"):
+                mask &= days_held > value
+        elif key == "discount_pct_gt":
+            mask &= discount_pct > value
+        elif key == "payment_method_in":
+            mask &= np.isin(payment_method, list(value))
+        elif key == "payment_method_not_in":
+            mask &= ~np.isin(payment_method, list(value))
+    return mask
+
+
+def eligibility_status_codes(is_final_sale, days_held, discount_pct, has_discount, payment_method,
+                             country_code=None, policy=None):
+    """
+    Vectorized get_eligibility status codes over aligned arrays. The masks are
+    built from the same return-policy rules, in the same precedence order,
+    with per-country thresholds applied to each country's rows.
+    """
+    policy = policy or get_policy()
+    arrays = (
+        np.asarray(is_final_sale, dtype=bool),
+        np.asarray(days_held, dtype="float64"),
+        np.asarray(discount_pct, dtype="float64"),
+        np.asarray(has_discount, dtype=bool),
+        np.asarray(payment_method, dtype=object),
+    )
+    n = len(arrays[0])
+    countries = np.full(n, None, dtype=object) if country_code is None else np.asarray(country_code, dtype=object)
+    statuses = np.empty(n, dtype=object)
+    overridden = [code for code in policy.countries if code is not None]
+    groups = [(code, countries == code) for code in overridden]
+    groups.append((None, ~np.isin(countries, overridden)))
+    for code, rows in groups:
+        if not rows.any():
+            continue
+        subset = [a[rows] for a in arrays]
+        rules = policy.rule_conditions(code)
+        masks = [_rule_mask(conditions, *subset) for _, conditions in rules]
+        statuses[rows] = np.select(masks, [status for status, _ in rules], default=None)
+    return statuses
+
+
+def apply_compare_at_discounts(df):
+    """Treat lines sold below their variant's compare-at price as discounted, unless a discount property is set."""
+    compare_at = df["compare_at_price"].astype("float64")
+    marked_down = ~df["has_discount"] & (compare_at > df["paid_price"]) & (df["paid_price"] > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        markdown_pct = np.round((compare_at - df["paid_price"]) / compare_at * 100)
+    df["discount_pct"] = np.where(marked_down, markdown_pct, df["discount_pct"]).astype("int64")
+    df["has_discount"] = df["has_discount"] | marked_down
+    return df
+
+
+def compute_eligibility(df, now=None):
+    """Add days_held, eligibility_status and return_label columns to a flattened frame."""
+    df = apply_compare_at_discounts(df.copy())
+    df["days_held"] = compute_days_held(df["delivered_at"], now)
+    df["eligibility_status"] = eligibility_status_codes(
+        df["is_final_sale"], df["days_held"], df["discount_pct"], df["has_discount"], df["payment_method"],
+        df["country_code"],
+    )
+    df["return_label"] = np.where(df["was_returned"], "RETURNED", df["eligibility_status"])
+    return df
+
+
+def exposure_report(df):
+    """Line count, units and paid value per return label, for finance reporting."""
+    df = df.assign(paid_value=df["paid_price"] * df["quantity"])
+    return (
+        df.groupby("return_label")
+        .agg(lines=("line_item_id", "size"), units=("quantity", "sum"), paid_value=("paid_value", "sum"))
+        .sort_values("paid_value", ascending=False)
+    )
+
+
+if __name__ == "__main__":
+    # python app/bulk_eligibility.py [report.csv] -- reads orders from the local order index
+    from order_index import get_index
+
+    index = get_index()
+    if index is None:
+        sys.exit("ORDER_INDEX_PATH is not set")
+    frame = compute_eligibility(flatten_orders(index.iter_orders()))
+    print(exposure_report(frame).to_string())
+    if len(sys.argv) > 1:
+        frame.to_csv(sys.argv[1], index=False)
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import cache_backend
+
+# Seconds each resource type stays fresh. Fulfillment status changes often,
+# customers and variants rarely.
+DEFAULT_TTLS = {
+    "order": 300,
+    "order_name": 300,
+    "fulfillment": 60,
+    "eligibility": 60,
+    "customer": 3600,
+    "variant": 3600,
+}
+# With a shared backend, cap how long this process trusts its own copy, since
+# webhook invalidations from other instances only reach the shared store
+LOCAL_MAX_TTL = float(os.getenv("CACHE_LOCAL_MAX_TTL", "30"))
+
+MISSING = object()
+
+
+def _ttls_from_env():
+    return {
+        resource: float(os.getenv(f"CACHE_TTL_{resource.upper()}", ttl))
+        for resource, ttl in DEFAULT_TTLS.items()
+    }
+
+
+def estimate_size(value):
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ResponseCache:
+    """
+    In-process TTL cache for Admin API lookups, keyed by (resource, id).
+    Entries expire after the resource's TTL and the least recently used
+    entries are evicted once either max_entries or max_bytes is exceeded.
+    Values are shared, not copied, so callers must treat them as read-only.
+
+    With a backend (see cache_backend) every set and invalidate is applied to it
+    on a single writer thread, and aget looks a local miss up there on a worker
+    thread before counting it as a miss, so entries survive restarts and are
+    shared between instances without the event loop waiting on disk or network.
+    Backend failures are logged and treated as misses; the Admin API is still
+    the source of truth.
+    """
+
+    def __init__(self, ttls=None, max_entries=2000, max_bytes=32 * 1024 * 1024, backend=None,
+                 local_max_ttl=LOCAL_MAX_TTL):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.local_max_ttl = local_max_ttl
+        self.total_bytes = 0
+        self.hits = {}
+        self.misses = {}
+        self.backend_hits = {}
+        self.backend_errors = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # One thread, so backend writes and deletes apply in the order they were made
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+
+    def _get_local(self, resource, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(cache_key)
+                entry = None
+            if entry is None:
+                return MISSING
+            self._entries.move_to_end(cache_key)
+            self.hits[resource] = self.hits.get(resource, 0) + 1
+            return entry[1]
+
+    def _count_miss(self, resource):
+        with self._lock:
+            self.misses[resource] = self.misses.get(resource, 0) + 1
+
+    def get(self, resource, key):
+        """This process's copy only; never blocks on the backend. Async code uses aget."""
+        value = self._get_local(resource, (resource, str(key)))
+        if value is MISSING:
+            self._count_miss(resource)
+        return value
+
+    async def aget(self, resource, key):
+        """Like get, but a local miss is looked up in the backend, on a worker thread so the event loop never waits on it."""
+        cache_key = (resource, str(key))
+        value = self._get_local(resource, cache_key)
+        if value is not MISSING:
+            return value
+        if self.backend is not None and self.ttls.get(resource, 0) > 0:
+            loop = asyncio.get_running_loop()
+            found = await loop.run_in_executor(None, self._backend_get, resource, key)
+            if found is not None:
+                value, size, remaining = found
+                self._store(cache_key, value, size, min(remaining, self.local_max_ttl))
+                with self._lock:
+                    self.hits[resource] = self.hits.get(resource, 0) + 1
+                    self.backend_hits[resource] = self.backend_hits.get(resource, 0) + 1
+                return value
+        self._count_miss(resource)
+        return MISSING
+
+    def set(self, resource, key, value, size=None):
+        """Store locally; with a backend the value is also written through on the writer thread."""
+        ttl = self.ttls.get(resource, 0)
+        if ttl <= 0:
+            return
+        if size is None:
+            size = estimate_size(value)
+        if self.backend is not None:
+            self._writer.submit(self._backend_set, resource, key, value, ttl)
+            ttl = min(ttl, self.local_max_ttl)
+        self._store((resource, str(key)), value, size, ttl)
+
+    def _store(self, cache_key, value, size, ttl):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            self._entries[cache_key] = (time.monotonic() + ttl, value, size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    # Backend calls run off the event loop. Any failure, including one to
+    # serialize or deserialize a value, is logged and counted, and the lookup
+    # carries on as a miss.
+
+    def _backend_failed(self, method, error):
+        with self._lock:
+            self.backend_errors += 1
+        print(f"Cache backend {method} failed: {error}")
+
+    def _backend_get(self, resource, key):
+        try:
+            found = self.backend.get(cache_backend.backend_key(resource, key))
+            if found is None:
+                return None
+            data, remaining = found
+            return cache_backend.decode(resource, data), len(data), remaining
+        except Exception as e:
+            self._backend_failed("get", e)
+            return None
+
+    def _backend_set(self, resource, key, value, ttl):
+        try:
+            self.backend.set(cache_backend.backend_key(resource, key), cache_backend.encode(value), ttl)
+        except Exception as e:
+            self._backend_failed("set", e)
+
+    def _backend_delete(self, resource, key):
+        try:
+            self.backend.delete(cache_backend.backend_key(resource, key))
+        except Exception as e:
+            self._backend_failed("delete", e)
+
+    def invalidate(self, resource, key):
+        with self._lock:
+            self._remove((resource, str(key)))
+        if self.backend is not None:
+            self._writer.submit(self._backend_delete, resource, key)
+
+    def keys_where(self, resource, predicate):
+        """Keys of this process's live resource entries whose value satisfies predicate."""
+        now = time.monotonic()
+        with self._lock:
+            entries = [(key[1], entry[1]) for key, entry in self._entries.items()
+                       if key[0] == resource and entry[0] > now]
+        return [key for key, value in entries if predicate(value)]
+
+    def flush(self):
+        """Wait until every queued backend write and delete has been applied."""
+        if self.backend is not None:
+            self._writer.submit(lambda: None).result()
+
+    def clear(self):
+        """Drop this process's entries; the shared backend is left alone."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def stats(self):
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "evictions": self.evictions,
+            "backend_hits": dict(self.backend_hits),
+            "backend_errors": self.backend_errors,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+
+
+cache = ResponseCache(
+    ttls=_ttls_from_env(),
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    backend=cache_backend.backend_from_env(),
+)
+
+
+@metrics.register_collector
+def _cache_samples():
+    stats = cache.stats()
+    samples = [
+        ("response_cache_entries", "gauge", "Entries in the response cache", {}, stats["entries"]),
+        ("response_cache_bytes", "gauge", "Approximate bytes held by the response cache", {}, stats["bytes"]),
+        ("response_cache_evictions_total", "counter", "LRU evictions from the response cache", {}, stats["evictions"]),
+        ("response_cache_backend_errors_total", "counter", "Failed shared cache backend calls", {}, stats["backend_errors"]),
+    ]
+    for resource in sorted(set(stats["hits"]) | set(stats["misses"])):
+        hits, misses = stats["hits"].get(resource, 0), stats["misses"].get(resource, 0)
+        samples += [
+            ("response_cache_hits_total", "counter", "Response cache hits", {"resource": resource}, hits),
+            ("response_cache_misses_total", "counter", "Response cache misses", {"resource": resource}, misses),
+            ("response_cache_hit_ratio", "gauge", "Response cache hit ratio", {"resource": resource}, hits / (hits + misses)),
+            ("response_cache_backend_hits_total", "counter", "Response cache hits served by the shared backend",
+             {"resource": resource}, stats["backend_hits"].get(resource, 0)),
+        ]
+    return samples
@@ -0,0 +1,172 @@
+"""
+Shared second level for the response cache (cache.ResponseCache).
+
+The in-process cache is lost on every restart and each instance fills its own,
+so CACHE_BACKEND can add a store behind it that outlives the process:
+
+    memory   nothing behind the in-process cache (default)
+    sqlite   a SQLite file at CACHE_SQLITE_PATH; survives restarts and is shared
+             by the workers on one host
+    redis    CACHE_REDIS_URL through redis-py (pip install redis); shared by every
+             instance. Any client with the redis-py interface can be passed in,
+             e.g. fakeredis.FakeRedis() as a local stand-in.
+
+Values are stored as msgpack when it is installed, otherwise as compact JSON
+(orjson when installed). Backends only see bytes and keep their own expiry.
+"""
+import os
+import time
+import sqlite3
+import threading
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "response_cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.25"))
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "shopify-mcp:")
+
+try:
+    import msgpack
+
+    SERIALIZER = "msgpack"
+
+    def _dumps(value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def _loads(data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+except ImportError:
+    try:
+        import orjson
+
+        SERIALIZER = "orjson"
+
+        def _dumps(value):
+            # Fulfillment status maps are keyed by integer line-item ids
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+        _loads = orjson.loads
+    except ImportError:
+        import json
+
+        SERIALIZER = "json"
+
+        def _dumps(value):
+            return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+        _loads = json.loads
+
+
+def _int_keys(status_map):
+    return {int(k): v for k, v in status_map.items()}
+
+
+# JSON (orjson or the json module) turns the line_item_id keys of fulfillment status maps into strings
+_RESTORE = {
+    "fulfillment": _int_keys,
+    "eligibility": lambda value: (value[0], _int_keys(value[1]), value[2]),
+}
+
+
+def encode(value):
+    return _dumps(value)
+
+
+def decode(resource, data):
+    value = _loads(data)
+    restore = _RESTORE.get(resource)
+    return restore(value) if restore else value
+
+
+def backend_key(resource, key):
+    return f"{CACHE_KEY_PREFIX}{resource}:{key}"
+
+
+class SQLiteBackend:
+    """Expiring key/value table in a local SQLite file; expired rows are purged every purge_every writes."""
+
+    def __init__(self, path, purge_every=500):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (data, seconds left) or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        return (row[0], remaining) if remaining > 0 else None
+
+    def set(self, key, data, ttl):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                               (key, now + ttl, data))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class RedisBackend:
+    """Keys with a PX expiry in Redis, shared by every instance pointed at the same server."""
+
+    def __init__(self, url=None, client=None, timeout=CACHE_REDIS_TIMEOUT):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.client = client
+
+    def get(self, key):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        data, pttl = pipe.execute()
+        if data is None or pttl is None or pttl <= 0:
+            return None
+        return data, pttl / 1000
+
+    def set(self, key, data, ttl):
+        self.client.set(key, data, px=max(1, int(ttl * 1000)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def count(self):
+        return sum(1 for _ in self.client.scan_iter(match=f"{CACHE_KEY_PREFIX}*", count=500))
+
+    def close(self):
+        self.client.close()
+
+
+def backend_from_env():
+    """Build the backend CACHE_BACKEND selects, or None for the in-process cache only."""
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(CACHE_SQLITE_PATH)
+    if CACHE_BACKEND == "redis":
+        if not CACHE_REDIS_URL:
+            raise RuntimeError("CACHE_BACKEND=redis needs CACHE_REDIS_URL (or REDIS_URL)")
+        return RedisBackend(CACHE_REDIS_URL)
+    if CACHE_BACKEND != "memory":
+        raise RuntimeError(f"unknown CACHE_BACKEND {CACHE_BACKEND!r}, expected memory, sqlite or redis")
+    return None
@@ -0,0 +1,227 @@
+import os
+import time
+import asyncio
+from shopify_client import API_BASE, get_client, _cached
+from retry import send_with_retry, no_limit
+from tools import build_status_map
+from cache import cache
+import metrics
+
+GRAPHQL_VERSION = os.getenv("SHOPIFY_GRAPHQL_VERSION", "2024-10")
+LINE_ITEMS_PAGE = int(os.getenv("SHOPIFY_GRAPHQL_LINE_ITEMS", "50"))
+NESTED_PAGE = int(os.getenv("SHOPIFY_GRAPHQL_NESTED", "5"))
+
+# Only the fields process_order_items and the eligibility response read.
+# Page sizes bound the query cost (Shopify rejects single queries above 1000
+# points); orders that do not fit in one page fall back to REST.
+ELIGIBILITY_QUERY = """
+query OrderEligibility($id: ID!, $lines: Int!, $nested: Int!) {
+  order(id: $id) {
+    legacyResourceId
+    name
+    email
+    paymentGatewayNames
+    discountCodes
+    customer { legacyResourceId numberOfOrders }
+    billingAddress { name }
+    shippingAddress { countryCodeV2 }
+    totalPriceSet { presentmentMoney { amount currencyCode } }
+    lineItems(first: $lines) {
+      pageInfo { hasNextPage }
+      nodes {
+        id
+        name
+        sku
+        quantity
+        currentQuantity
+        originalUnitPriceSet { shopMoney { amount } presentmentMoney { amount currencyCode } }
+        customAttributes { key value }
+        discountAllocations { allocatedAmountSet { presentmentMoney { amount } } }
+        variant { legacyResourceId price compareAtPrice product { legacyResourceId } }
+      }
+    }
+    fulfillments(first: $nested) {
+      displayStatus
+      updatedAt
+      fulfillmentLineItems(first: $lines) { nodes { lineItem { id } } }
+    }
+    refunds(first: $nested) {
+      refundLineItems(first: $lines) { nodes { lineItem { id } } }
+    }
+    fulfillmentOrders(first: $nested) {
+      pageInfo { hasNextPage }
+      nodes {
+        status
+        lineItems(first: $lines) { nodes { lineItem { id } } }
+      }
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    pass
+
+
+class CostLimiter:
+    """
+    Tracks the GraphQL cost bucket from extensions.cost.throttleStatus and
+    waits before a query whose expected cost is not yet available.
+    """
+
+    def __init__(self):
+        self.available = None
+        self.restore_rate = 50.0
+        self.last_cost = 0.0
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if self.available is None:
+            return
+        available = self.available + (time.monotonic() - self.updated) * self.restore_rate
+        if available < self.last_cost:
+            await asyncio.sleep((self.last_cost - available) / self.restore_rate)
+
+    def update(self, extensions):
+        status = (extensions or {}).get("cost", {}).get("throttleStatus")
+        if "requestedQueryCost" in (extensions or {}).get("cost", {}):
+            self.last_cost = float(extensions["cost"]["requestedQueryCost"])
+        if status:
+            self.available = float(status["currentlyAvailable"])
+            self.restore_rate = float(status["restoreRate"]) or self.restore_rate
+            self.updated = time.monotonic()
+
+
+cost_limiter = CostLimiter()
+
+
+@metrics.register_collector
+def _cost_samples():
+    if cost_limiter.available is None:
+        return []
+    return [("shopify_graphql_cost_available", "gauge", "GraphQL cost points available at the last response", {}, cost_limiter.available)]
+
+
+async def graphql_query(query, variables, max_retries=3):
+    url = f"{API_BASE}/{GRAPHQL_VERSION}/graphql.json"
+    for attempt in range(max_retries + 1):
+        await cost_limiter.acquire()
+        # GraphQL is metered by query cost (cost_limiter), not by the REST leaky bucket
+        response = await send_with_retry(get_client(), "POST", url, max_retries=max_retries, limiter=no_limit,
+                                         json={"query": query, "variables": variables})
+        data = response.json()
+        cost_limiter.update(data.get("extensions"))
+        errors = data.get("errors") or []
+        throttled = any((e.get("extensions") or {}).get("code") == "THROTTLED" for e in errors)
+        if throttled and attempt < max_retries:
+            continue
+        if errors:
+            raise GraphQLError("; ".join(e.get("message", str(e)) for e in errors))
+        return data["data"]
+
+
+def _legacy_id(gid):
+    return int(str(gid).rsplit("/", 1)[-1])
+
+
+def _line_item_ids(connection):
+    return [_legacy_id(node["lineItem"]["id"]) for node in connection["nodes"] if node.get("lineItem")]
+
+
+def map_order(node):
+    """Map the GraphQL order into the REST order dict shape process_order_items reads."""
+    if (node["lineItems"]["pageInfo"]["hasNextPage"]
+            or node["fulfillmentOrders"]["pageInfo"]["hasNextPage"]
+            or len(node["fulfillments"]) >= NESTED_PAGE
+            or len(node["refunds"]) >= NESTED_PAGE):
+        raise GraphQLError("order does not fit in a single GraphQL page")
+    line_items = []
+    for item in node["lineItems"]["nodes"]:
+        prices = item["originalUnitPriceSet"]
+        variant = item.get("variant") or {}
+        if variant:
+            # Prime the variant cache so the compare-at lookup needs no extra request
+            cache.set("variant", variant["legacyResourceId"],
+                      {"price": variant["price"], "compare_at_price": variant["compareAtPrice"]})
+        line_items.append({
+            "id": _legacy_id(item["id"]),
+            "variant_id": int(variant["legacyResourceId"]) if variant else None,
+            "product_id": int(variant["product"]["legacyResourceId"]) if variant else None,
+            "name": item["name"],
+            "sku": item["sku"],
+            "quantity": item["quantity"],
+            "current_quantity": item["currentQuantity"],
+            "price": prices["shopMoney"]["amount"],
+            "price_set": {"presentment_money": {
+                "amount": prices["presentmentMoney"]["amount"],
+                "currency_code": prices["presentmentMoney"]["currencyCode"],
+            }},
+            "properties": [{"name": a["key"], "value": a["value"]} for a in item["customAttributes"]],
+            "discount_allocations": [
+                {"amount_set": {"presentment_money": {"amount": d["allocatedAmountSet"]["presentmentMoney"]["amount"]}}}
+                for d in item["discountAllocations"]
+            ],
+        })
+    customer = node.get("customer") or {}
+    billing = node.get("billingAddress")
+    shipping = node.get("shippingAddress")
+    total = node["totalPriceSet"]["presentmentMoney"]
+    return {
+        "id": int(node["legacyResourceId"]),
+        "name": node["name"],
+        "email": node["email"],
+        "customer": {"id": int(customer["legacyResourceId"])} if customer else None,
+        "billing_address": {"name": billing["name"]} if billing else None,
+        "shipping_address": {"country_code": shipping["countryCodeV2"]} if shipping else None,
+        "total_price_set": {"presentment_money": {"amount": total["amount"], "currency_code": total["currencyCode"]}},
+        "discount_codes": [{"code": code} for code in node["discountCodes"]],
+        "payment_gateway_names": node["paymentGatewayNames"],
+        "line_items": line_items,
+        "fulfillments": [
+            {
+                "shipment_status": (f.get("displayStatus") or "").lower(),
+                "updated_at": f["updatedAt"],
+                "line_items": [{"id": i} for i in _line_item_ids(f["fulfillmentLineItems"])],
+            }
+            for f in node["fulfillments"]
+        ],
+        "refunds": [
+            {"refund_line_items": [{"line_item_id": i} for i in _line_item_ids(r["refundLineItems"])]}
+            for r in node["refunds"]
+        ],
+    }
+
+
+def map_fulfillment_orders(node):
+    return build_status_map([
+        {
+            "status": fo["status"].lower(),
+            "line_items": [{"line_item_id": i} for i in _line_item_ids(fo["lineItems"])],
+        }
+        for fo in node["fulfillmentOrders"]["nodes"]
+    ])
+
+
+async def async_fetch_eligibility_inputs_graphql(order_id, refresh=False):
+    """
+    Fetch everything get_order_eligibility needs in one GraphQL query and
+    return it as (order_data, status_map, order_count, timings), the same
+    shape as the REST pipeline.
+    """
+    async def fetch():
+        data = await graphql_query(ELIGIBILITY_QUERY, {
+            "id": f"gid://shopify/Order/{order_id}",
+            "lines": LINE_ITEMS_PAGE,
+            "nested": NESTED_PAGE,
+        })
+        node = data.get("order")
+        if node is None:
+            raise GraphQLError(f"order {order_id} not found")
+        customer = node.get("customer") or {}
+        return map_order(node), map_fulfillment_orders(node), int(customer.get("numberOfOrders") or 0)
+
+    start = time.perf_counter()
+    order_data, status_map, order_count = await _cached("eligibility", order_id, fetch, refresh)
+    elapsed = round((time.perf_counter() - start) * 1000, 1)
+    return order_data, status_map, order_count, {"graphql_ms": elapsed, "total_ms": elapsed}
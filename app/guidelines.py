@@ -0,0 +1,257 @@
+"""
+Customer-care guideline documents, loaded from data/ and served as MCP resources.
+
+    email-response   data/email_guidelines.txt   how to write return emails
+    brand-voice      data/guidelines.txt         brand voice and decision logic
+
+Each document is read once and carries a version (a short content hash, also
+used as the HTTP ETag) so clients can cache it and ask only whether it
+changed. Files are re-read when their modification time changes.
+
+On load a document is split into sections. The documents are plain text
+exported from a word processor, so headings are recognised by shape: a short
+line after a blank line that does not read like a sentence. "Part N" and
+"Step N" lines nest the headings that follow them. The sections are indexed
+with BM25 so agents can fetch only the parts they need.
+"""
+import os
+import re
+import math
+import time
+import hashlib
+import threading
+from collections import Counter
+
+GUIDELINES_DIR = os.getenv("GUIDELINES_DIR", os.path.join(os.path.dirname(__file__), "..", "data"))
+RELOAD_CHECK_INTERVAL = float(os.getenv("GUIDELINES_RELOAD_INTERVAL", "2"))
+
+DOCUMENTS = {
+    "email-response": "email_guidelines.txt",
+    "brand-voice": "guidelines.txt",
+}
+
+
+def content_version(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+STRUCTURAL = re.compile(r"^(Part|Step) (\d+)\b")
+# Headings that belong to the section above them rather than starting a new topic
+SUBHEADING = re.compile(r"^(Examples?\b|Tone Examples?\b|Instead of:|Write:|If )")
+SENTENCE_END = (".", ",", ";", "!", "?", '"', "\u201d")
+STOPWORDS = frozenset(
+    "a an and are as at be by do for from has have how i if in is it its me my of on or our "
+    "so that the their them they this to was we what when which with you your".split()
+)
+
+
+def _is_heading(line, after_blank):
+    text = line.strip()
+    if not text or line[0].isspace() or len(text) > 80 or len(text.split()) > 12:
+        return False
+    if text.endswith(SENTENCE_END) or "[" in text or not text[0].isupper():
+        return False
+    return after_blank or bool(STRUCTURAL.match(text))
+
+
+def _slug(title):
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+
+def tokenize(text):
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class Section:
+    def __init__(self, id, title, level, path, body):
+        self.id = id
+        self.title = title
+        self.level = level
+        self.path = path
+        self.body = body
+
+    @property
+    def text(self):
+        return f"{self.title}\n{self.body}".strip()
+
+
+def parse_sections(text):
+    """
+    Split a guidelines document into a flat list of Sections in document
+    order. level is 1 for Part headings and top-level headings, 2 for Steps,
+    and one below the enclosing Part/Step for any other heading. Example and
+    label headings ("Example…", "Instead of:", "If …") nest under the heading
+    before them, so a section's subtree carries its examples. path holds the
+    titles of the enclosing sections.
+    """
+    sections = []
+    heading, body, after_blank = None, [], True
+    part = step = None
+    anchor = None  # (title, level, path) of the last heading example headings nest under
+
+    def place(title):
+        nonlocal part, step, anchor
+        match = STRUCTURAL.match(title)
+        if match and match.group(1) == "Part":
+            part, step = title, None
+            level, path = 1, []
+        elif match:
+            step = title
+            level, path = 2, [part] if part else []
+        elif SUBHEADING.match(title) and anchor is not None:
+            return anchor[1] + 1, anchor[2] + [anchor[0]]
+        else:
+            path = [t for t in (part, step) if t]
+            level = len(path) + 1
+            if path:
+                # Inside a Part/Step the Part/Step itself is what examples belong to
+                anchor = (path[-1], level - 1, path[:-1])
+                return level, path
+        anchor = (title, level, path)
+        return level, path
+
+    def close():
+        if heading is None and not "".join(body).strip():
+            return
+        title, level, path = heading or ("Introduction", 1, [])
+        base = _slug(title)
+        used = {s.id for s in sections}
+        section_id = base if base not in used else next(f"{base}-{n}" for n in range(2, 1000) if f"{base}-{n}" not in used)
+        sections.append(Section(section_id, title, level, path, "\n".join(body).strip()))
+
+    for line in text.splitlines():
+        if _is_heading(line, after_blank):
+            close()
+            title = line.strip()
+            heading, body = (title, *place(title)), []
+        else:
+            body.append(line.rstrip())
+        after_blank = not line.strip()
+    close()
+    return sections
+
+
+class SectionIndex:
+    """BM25 over a document's sections; the title counts twice."""
+
+    def __init__(self, sections, k1=1.5, b=0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self.terms = [Counter(tokenize(s.title) * 2 + tokenize(s.body)) for s in sections]
+        self.lengths = [sum(t.values()) for t in self.terms]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        df = Counter(term for terms in self.terms for term in terms)
+        n = len(sections)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def search(self, query, top_k=3):
+        """[(score, section)] for the top_k sections matching query, best first."""
+        query_terms = set(tokenize(query))
+        scored = []
+        for section, terms, length in zip(self.sections, self.terms, self.lengths):
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, section))
+        scored.sort(key=lambda pair: -pair[0])
+        return scored[:top_k]
+
+
+class GuidelineDocument:
+    def __init__(self, name, path, text, mtime):
+        self.name = name
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        self.version = content_version(text)
+        self.sections = parse_sections(text)
+        self.index = SectionIndex(self.sections)
+
+    def find(self, name):
+        """Sections whose id equals name or whose title contains it (case-insensitive)."""
+        wanted = name.strip().lower()
+        exact = [s for s in self.sections if s.id == wanted]
+        return exact or [s for s in self.sections if wanted in s.title.lower()]
+
+    def subtree_text(self, section):
+        """The section's text followed by the text of every section nested under it."""
+        start = self.sections.index(section)
+        parts = [section.text]
+        for following in self.sections[start + 1:]:
+            if following.level <= section.level:
+                break
+            parts.append(following.text)
+        return "\n\n".join(parts)
+
+    def toc(self):
+        return [{"id": s.id, "title": s.title, "level": s.level, "chars": len(s.text)} for s in self.sections]
+
+    def info(self):
+        return {
+            "name": self.name,
+            "uri": f"guidelines://{self.name}",
+            "version": self.version,
+            "bytes": len(self.text.encode("utf-8")),
+            "modified_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.mtime)),
+        }
+
+
+class GuidelinesStore:
+    """Holds the loaded documents and re-reads a file when it changes on disk."""
+
+    def __init__(self, directory, documents):
+        self.directory = directory
+        self.documents = documents
+        self._loaded = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        if name not in self.documents:
+            raise KeyError(f"unknown guidelines {name!r}, expected one of {sorted(self.documents)}")
+        now = time.monotonic()
+        if name not in self._loaded or now - self._checked.get(name, 0.0) >= RELOAD_CHECK_INTERVAL:
+            self._checked[name] = now
+            self._reload_if_changed(name)
+        return self._loaded[name]
+
+    def all(self):
+        return [self.get(name) for name in self.documents]
+
+    def _reload_if_changed(self, name):
+        path = os.path.join(self.directory, self.documents[name])
+        with self._lock:
+            current = self._loaded.get(name)
+            try:
+                mtime = os.stat(path).st_mtime
+                if current is not None and mtime == current.mtime:
+                    return
+                with open(path, encoding="utf-8") as f:
+                    document = GuidelineDocument(name, path, f.read(), mtime)
+            except OSError as e:
+                if current is None:
+                    raise
+                print(f"Keeping previous {name} guidelines, failed to read {path}: {e}")
+                return
+            if current is not None and document.version != current.version:
+                print(f"Reloaded {name} guidelines from {path} (version {document.version})")
+            self._loaded[name] = document
+
+
+store = GuidelinesStore(GUIDELINES_DIR, DOCUMENTS)
+
+
+def get_guidelines(name="email-response"):
+    return store.get(name)
@@ -1,33 +1,51 @@
 import os
-from fastmcp import FastMCP
-import shopify
+import time
+import asyncio
+from fastmcp import FastMCP, Context
 from dotenv import load_dotenv, find_dotenv
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
-import requests
-from requests.exceptions import RequestException
 from tools import *
-from fastmcp.resources import TextResource
+from shopify_client import *
+from webhooks import handle_webhook
+import metrics
+from metrics import ToolMetricsMiddleware
+from admission import AdmissionMiddleware
+from starlette.responses import PlainTextResponse, Response
+from guidelines import get_guidelines, store as guidelines_store
+from policy import get_policy
+from order_index import get_index, ensure_sync_task, run_blocking
 
 # Automatically finds .env in current directory or parent directories
 load_dotenv(find_dotenv())
+shopify_initialized = None
+
 def init_shopify():
+    """
+    Configure the ShopifyAPI resource classes, once. The tools talk to the
+    Admin API through shopify_client, so this only runs from __main__ and the
+    shopify package is not imported on the serving path.
+    """
+    global shopify_initialized
+    if shopify_initialized is not None:
+        return shopify_initialized
     try:
         shop_url = os.getenv("SHOP_URL")
         access_token = os.getenv("SHOPIFY_ACCESS_TOKEN")
         if not (shop_url and access_token):
             print("Warning: Missing Shopify credentials.")
+            shopify_initialized = False
             return False
-        
+
+        import shopify
         shop_url = f"https://{shop_url}/admin/api/2024-01"
         shopify.ShopifyResource.set_site(shop_url)
         shopify.ShopifyResource.set_headers({"X-Shopify-Access-Token": access_token})
-        return True
+        shopify_initialized = True
     except Exception as e:
         print(f"Error initializing Shopify: {e}")
-        return False
-
-shopify_initialized = init_shopify()
+        shopify_initialized = False
+    return shopify_initialized
 
 cors_middleware = Middleware(
     CORSMiddleware,
@@ -47,45 +65,100 @@ cors_middleware = Middleware(
 
 mcp = FastMCP("shopify-mcp")
 
+# Orders fetched at once by get_orders_eligibility_batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Treat lines sold below their variant's compare-at price as discounted when they carry no discount properties
+COMPARE_AT_DISCOUNTS = os.getenv("COMPARE_AT_DISCOUNTS", "1") != "0"
+# Email-response guideline sections sent with get_return_reply_bundle, per stage
+BUNDLE_SECTIONS = {
+    "options": ["core-rules", "brand-writing-style", "handling-customer-sentiment", "part-1-writing-return-options-emails"],
+    "instructions": ["core-rules", "brand-writing-style", "part-2-writing-return-instructions-emails"],
+}
+# Order ids are 10-20 digits; anything shorter is taken as an order name without '#'
+ORDER_ID_MIN_DIGITS = 10
+# Added to the options stage when an item is restricted (anything but a full-price return)
+POLICY_EXPLANATION_SECTION = "policy-explanation-style"
+
+
+# Admission control first, so queued calls are not timed as running and shed calls never start
+mcp.add_middleware(AdmissionMiddleware())
+mcp.add_middleware(ToolMetricsMiddleware())
+
+# Parse and index the guidelines and build the policy's option blocks now rather than on the first tool call
+guidelines_store.all()
+get_policy()
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request):
+    """Prometheus scrape endpoint for tool, Shopify, cache and rate-limit metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@mcp.custom_route("/webhooks/shopify", methods=["POST"])
+async def shopify_webhook(request):
+    """Receive Shopify webhooks (orders/updated, fulfillments/update, refunds/create, customers/update) and refresh the cache."""
+    return await handle_webhook(request)
+
 @mcp.tool()
-def get_order_details_by_order_id(order_id: str):
-    """Get order details by order id (order name) (e.g., '#12345')."""
+async def get_order_details_by_order_id(order_id: str, refresh: bool = False, fields: str | None = None, full: bool = False):
+    """
+    Get order details by order id (order name) (e.g., '#12345'). Set refresh=True to bypass the cache.
+    By default returns the support view: status, totals, discount codes, customer, shipping address, line items, fulfillments with tracking, and refunds.
+    fields takes a comma-separated list instead, with dotted paths for nested fields (e.g. 'name,line_items.sku,fulfillments.tracking_url'); full=True returns the complete order.
+    """
+    fields = None if full else fields or ORDER_SUPPORT_FIELDS
     try:
-        oid = str(order_id)
-        if not oid.startswith("#"):
-            oid = f"#{oid}"
-        order = shopify.Order.find_first(name=oid, status="any")
+        index = get_index()
+        if index is not None and not refresh:
+            ensure_sync_task()
+            order = await run_blocking(index.get_by_name, order_id)
+            if order:
+                return to_json(order if fields is None else project_order(order, fields))
+        order = await async_find_order_by_name(str(order_id), refresh=refresh, fields=fields)
         if order:
-            return order.to_dict()
+            return to_json(order)
         return {"error": "couldn't fetch order details"}
     except Exception as e:
         return {"error": str(e)}
 
 
 
-@mcp.tool()
-def search_orders_by_email(email:str):
-    """Get the details of all orders of a customer using their email."""
-
-    max_retries=3
-    url = f"https://luxmii.com/admin/api/2024-10/orders.json?status=any&email={email}"
-    headers = {
-        'Content-Type': 'application/json',
-        'X-Shopify-Access-Token': os.getenv("SHOPIFY_ACCESS_TOKEN")
-    }
-    retries = 0
-    while retries <= max_retries:
-        try:
-            response = requests.get(url, headers=headers, verify=False)
-            response.raise_for_status()
-            return response.json().get("orders", [])
-        except RequestException as e:
-            retries += 1
-            if retries > max_retries:
-                raise Exception(f"Failed to search orders: {str(e)}")
-            time.sleep(2 ** retries)
+INDEX_CURSOR = "index:"
 
 
+@mcp.tool()
+async def search_orders_by_email(email: str, full: bool = False, max_results: int | None = None,
+                                 cursor: str | None = None, ctx: Context | None = None):
+    """
+    Get all orders of a customer using their email.
+    By default each order is a slim summary (id, name, dates, financial/fulfillment status, total, tags); set full=True for complete order objects.
+    max_results caps how many orders are returned; when more exist, next_cursor is set and can be passed back as cursor to continue.
+    """
+    fields = None if full else ORDER_SUMMARY_FIELDS
+    index = get_index()
+    # Pages served from the order index continue with an offset cursor, Admin API pages with page_info
+    if index is not None and (cursor is None or cursor.startswith(INDEX_CURSOR)):
+        ensure_sync_task()
+        orders = await run_blocking(index.find_by_email, email, summaries=not full)
+        if orders:
+            offset = int(cursor[len(INDEX_CURSOR):]) if cursor else 0
+            end = len(orders) if max_results is None else offset + max_results
+            page = orders[offset:end]
+            if fields:
+                page = [project_order(order, fields) for order in page]
+            next_cursor = f"{INDEX_CURSOR}{end}" if end < len(orders) else None
+            return {"orders": page, "count": len(page), "next_cursor": next_cursor}
+        if cursor is not None:
+            return {"orders": [], "count": 0, "next_cursor": None}
+    orders = []
+    next_cursor = None
+    async for page, next_cursor in async_iter_order_pages(email, 'email', fields=fields,
+                                                          max_results=max_results, cursor=cursor):
+        orders.extend(page)
+        if ctx is not None:
+            await ctx.report_progress(len(orders), max_results, f"{len(orders)} orders fetched")
+    return {"orders": orders, "count": len(orders), "next_cursor": next_cursor}
 
 
 
@@ -94,32 +167,23 @@ def search_orders_by_email(email:str):
 
 
 
-@mcp.tool()
-def get_order_eligibility(order_id):
-    """
-    Retrieves the return eligibility status for every item in a specific Shopify order.
-    You can obtain the Shopify Order ID (a unique 10–20 character identifier, not the order name like #12345) using the companion tool get_order_details_by_order_id, which accepts the order name as input.
-    Alternatively, the Order ID may be provided directly by the user
-    
-    Arguments:
-    order_id (str) – The Shopify Order ID used to identify the order.
 
-    Returns:
-    dict – A structured response containing:
 
-    General order information (order ID, customer details, total amount, etc.)
-    Eligibility details for each item in the order, including:
-    Return status (eligible/ineligible)
-    Available return options (store credit, refund, exchange, etc.)
-    Any applicable conditions or restrictions
-    """
+async def order_eligibility(order_id, refresh=False, customer_tasks=None):
+    """Build the get_order_eligibility response for one order. Shared by the single and batch tools."""
     try:
         # Get all required data
-        order_data = get_shopify_data(order_id)
-        status_map = get_item_status(order_id)
-        customer_id = order_data['customer']['id']
-        order_count = get_order_count(customer_id)
-        results = process_order_items(order=order_data, statuses=status_map, order_count=order_count)
+        order_data, status_map, order_count, timings = await async_fetch_eligibility_inputs(order_id, refresh=refresh, customer_tasks=customer_tasks)
+        variant_prices = None
+        if COMPARE_AT_DISCOUNTS:
+            start = time.perf_counter()
+            try:
+                variant_prices = await async_get_variant_prices_batch(order_data['line_items'], refresh=refresh)
+            except Exception as e:
+                print(f"Variant prices unavailable for {order_id}, using line properties only: {e}")
+            timings["variants_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(f"get_order_eligibility {order_id} timings: {timings}")
+        results = process_order_items(order=order_data, statuses=status_map, order_count=order_count, variant_prices=variant_prices)
         # Extract order info
         order_info = {
             "order_id": order_id,
@@ -136,7 +200,8 @@ def get_order_eligibility(order_id):
         return {
             "success": True,
             "order_info": order_info,
-            "items": results
+            "items": results,
+            "timings": timings
         }
         
     except Exception as e:
@@ -148,33 +213,221 @@ def get_order_eligibility(order_id):
 
 
 
-# # Add the guidelines as a resource
-# guidelines_resource = TextResource(
-#     uri="guidelines://email-response",
-#     name="Email Response Guidelines",
-#     text=EMAIL_GUIDELINES,
-#     description="Comprehensive guidelines for writing customer email responses",
-#     tags={"guidelines", "email", "customer-service"}
-# )
 
-# mcp.add_resource(guidelines_resource)
 
+@mcp.tool()
+async def get_order_eligibility(order_id, refresh: bool = False):
+    """
+    Retrieves the return eligibility status for every item in a specific Shopify order.
+    You can obtain the Shopify Order ID (a unique 10–20 character identifier, not the order name like #12345) using the companion tool get_order_details_by_order_id, which accepts the order name as input.
+    Alternatively, the Order ID may be provided directly by the user
+    
+    Arguments:
+    order_id (str) – The Shopify Order ID used to identify the order.
+    refresh (bool) – Bypass cached order, fulfillment and customer data and fetch fresh copies.
 
+    Returns:
+    dict – A structured response containing:
+
+    General order information (order ID, customer details, total amount, etc.)
+    Eligibility details for each item in the order, including:
+    Return status (eligible/ineligible)
+    Available return options (store credit, refund, exchange, etc.)
+    Any applicable conditions or restrictions
+    """
+    return await order_eligibility(order_id, refresh=refresh)
 
 
 @mcp.tool()
-def get_email_response_guidelines():
+async def get_orders_eligibility_batch(order_ids: list[str], refresh: bool = False, ctx: Context | None = None):
     """
-    Use this tool to provide you email response guidelines. eg how to write email responses for our braand
-    
+    Retrieves return eligibility for many Shopify orders in one call (e.g. all orders of a customer or a sweep of open return requests).
+    Each entry in the result has the same shape as get_order_eligibility; an order that fails is reported with success=False and its error without failing the others.
+
+    Arguments:
+    order_ids (list[str]) – Shopify Order IDs (not order names).
+    refresh (bool) – Bypass cached data and fetch fresh copies.
     """
+    start = time.perf_counter()
+    order_ids = list(dict.fromkeys(str(order_id) for order_id in order_ids))
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    customer_tasks = {}
+
+    async def run(order_id):
+        async with semaphore:
+            return await order_eligibility(order_id, refresh=refresh, customer_tasks=customer_tasks)
+
+    tasks = [asyncio.create_task(run(order_id)) for order_id in order_ids]
+    done = 0
+    for finished in asyncio.as_completed(tasks):
+        await finished
+        done += 1
+        if ctx is not None:
+            await ctx.report_progress(done, len(tasks), f"{done}/{len(tasks)} orders done")
+    results = [task.result() for task in tasks]
+    return {
+        "success": True,
+        "orders": results,
+        "failed": sum(1 for r in results if not r["success"]),
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+@mcp.resource("guidelines://email-response", name="Email Response Guidelines", mime_type="text/plain",
+              description="How to write customer return emails. Version and hash are listed in guidelines://versions.",
+              tags={"guidelines", "email", "customer-service"})
+def email_response_guidelines_resource():
+    return get_guidelines("email-response").text
 
-    return(EMAIL_GUIDELINES)
 
+@mcp.resource("guidelines://brand-voice", name="Brand Voice Guidelines", mime_type="text/plain",
+              description="LUXMII brand voice, behaviour rules and return decision logic.",
+              tags={"guidelines", "customer-service"})
+def brand_voice_guidelines_resource():
+    return get_guidelines("brand-voice").text
 
 
+@mcp.resource("guidelines://versions", name="Guidelines Versions", mime_type="application/json",
+              description="Current version (content hash) of every guidelines document, to check before re-reading one.")
+def guidelines_versions_resource():
+    return {document.name: document.info() for document in guidelines_store.all()}
 
 
+@mcp.custom_route("/guidelines/{name}", methods=["GET"])
+async def guidelines_http(request):
+    """Plain HTTP access to a guidelines document with ETag / If-None-Match revalidation."""
+    try:
+        document = get_guidelines(request.path_params["name"])
+    except KeyError as e:
+        return PlainTextResponse(str(e), status_code=404)
+    etag = f'"{document.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return PlainTextResponse(document.text, headers=headers)
+
+
+@mcp.tool()
+async def get_email_response_guidelines(known_version: str | None = None):
+    """
+    Use this tool to provide you email response guidelines. eg how to write email responses for our braand
+
+    Returns {"version", "changed", "text"}. Pass the version from an earlier call as known_version:
+    if the guidelines have not changed since, text is omitted and changed is false, so reuse your copy.
+    """
+    document = get_guidelines("email-response")
+    if known_version == document.version:
+        return {"version": document.version, "changed": False}
+    return {"version": document.version, "changed": True, "text": document.text}
+
+
+@mcp.tool()
+async def get_guideline_sections(sections: list[str] | None = None, query: str | None = None,
+                                 top_k: int = 3, document: str | None = None):
+    """
+    Fetch only the parts of the guidelines you need instead of the whole text.
+    sections takes section ids or title fragments (e.g. 'part-2-writing-return-instructions-emails', 'Shipping Guidance')
+    and returns each matching section with everything nested under it. query returns the top_k sections
+    ranked by keyword relevance (e.g. 'store credit redemption'). With neither, returns the table of contents.
+    document limits the lookup to 'email-response' or 'brand-voice'; by default both are searched.
+    """
+    try:
+        documents = [get_guidelines(document)] if document else guidelines_store.all()
+    except KeyError as e:
+        return {"error": e.args[0]}
+    versions = {doc.name: doc.version for doc in documents}
+    if not sections and not query:
+        return {"versions": versions, "toc": {doc.name: doc.toc() for doc in documents}}
+
+    found, seen = [], set()
+    for name in sections or []:
+        for doc in documents:
+            for section in doc.find(name):
+                if (doc.name, section.id) not in seen:
+                    seen.add((doc.name, section.id))
+                    found.append({"document": doc.name, "id": section.id, "title": section.title,
+                                  "path": section.path, "text": doc.subtree_text(section)})
+    if query:
+        ranked = [(score, doc, section) for doc in documents for score, section in doc.index.search(query, top_k)]
+        ranked.sort(key=lambda item: -item[0])
+        for score, doc, section in ranked[:top_k]:
+            if (doc.name, section.id) not in seen:
+                seen.add((doc.name, section.id))
+                found.append({"document": doc.name, "id": section.id, "title": section.title,
+                              "path": section.path, "text": section.text, "score": round(score, 3)})
+    return {"versions": versions, "sections": found}
+
+
+def is_order_id(value):
+    """Shopify order ids are long numbers; order names are '#1234' or short numbers like '1234'."""
+    return value.isdigit() and len(value) >= ORDER_ID_MIN_DIGITS
+
+
+def bundle_guidelines(stage, restricted):
+    """The email-response sections for a reply bundle, each with everything nested under it."""
+    document = get_guidelines("email-response")
+    wanted = list(BUNDLE_SECTIONS[stage])
+    if restricted and stage == "options":
+        wanted.insert(2, POLICY_EXPLANATION_SECTION)
+    sections = []
+    for section_id in wanted:
+        for section in document.find(section_id)[:1]:
+            sections.append({"id": section.id, "text": document.subtree_text(section)})
+    return document.version, sections
+
+
+@mcp.tool()
+async def get_return_reply_bundle(order: str, stage: str = "options", refresh: bool = False,
+                                  known_guidelines_version: str | None = None):
+    """
+    Everything needed to draft a return email in one call: order info, per-item eligibility,
+    the numbered return options for each eligibility status (ready to paste), and the guideline sections for the email.
+    Use this instead of calling get_order_details_by_order_id, get_order_eligibility and get_email_response_guidelines separately.
+
+    Arguments:
+    order (str) – The Shopify Order ID or the order name, with or without '#' (e.g. '#12345' or '12345').
+    stage (str) – 'options' when presenting return options, 'instructions' once the customer has chosen one.
+    refresh (bool) – Bypass cached data and fetch fresh copies.
+    known_guidelines_version (str) – guidelines_version from an earlier bundle; when unchanged the guideline text is omitted.
+    """
+    if stage not in BUNDLE_SECTIONS:
+        return {"success": False, "error": f"unknown stage {stage!r}, expected one of {sorted(BUNDLE_SECTIONS)}"}
+    order_id = str(order).strip()
+    if not is_order_id(order_id):
+        # Full lookup so the order is cached under its id for the eligibility check below
+        found = await async_find_order_by_name(order_id, refresh=refresh)
+        if not found:
+            return {"success": False, "error": f"order {order_id} not found"}
+        order_id = str(found["id"])
+    result = await order_eligibility(order_id, refresh=refresh)
+    if not result["success"]:
+        return result
+
+    policy = get_policy()
+    option_sets = {}
+    items = []
+    for item in result["items"]:
+        status = item["eligibility_status"]
+        if status not in option_sets:
+            option_sets[status] = {"reason": item["eligibility_reason"],
+                                   **policy.option_blocks(status, item["country_code"])}
+        items.append({key: item[key] for key in ("name", "sku", "line_item_id", "quantity", "paid_price",
+                                                 "discount_percentage", "eligibility_status", "return_label",
+                                                 "days_held", "status")})
+
+    restricted = any(status != "FULL_PRICE" for status in option_sets)
+    version, sections = bundle_guidelines(stage, restricted)
+    bundle = {
+        "success": True,
+        "order_info": result["order_info"],
+        "items": items,
+        "option_sets": option_sets,
+        "guidelines_version": version,
+        "timings": result["timings"],
+    }
+    if known_guidelines_version != version:
+        bundle["guidelines"] = sections
+    return bundle
 
 
 if __name__ == "__main__":
@@ -187,8 +440,7 @@ if __name__ == "__main__":
     
     try:
         print("Initializing Shopify...")
-        shopify_initialized = init_shopify()
-        print(f"Shopify initialized: {shopify_initialized}")
+        print(f"Shopify initialized: {init_shopify()}")
         
         print(f"Starting server on 0.0.0.0:{port}")
         mcp.run(
@@ -0,0 +1,175 @@
+import re
+import time
+import threading
+from contextlib import contextmanager
+from fastmcp.server.middleware import Middleware as MCPMiddleware
+
+try:
+    from opentelemetry import trace
+    tracer = trace.get_tracer("mcp-luxmii")
+except ImportError:
+    tracer = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_registry = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total) in self._values.items():
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+def register_collector(fn):
+    """Register fn() -> [(name, kind, help, {labels}, value)] sampled at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    seen = set()
+    for collect in _collectors:
+        for name, kind, help, labels, value in collect():
+            if name not in seen:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                seen.add(name)
+            lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+tool_duration = Histogram("mcp_tool_duration_seconds", "MCP tool call latency", ["tool"])
+tool_calls = Counter("mcp_tool_calls_total", "MCP tool calls by outcome", ["tool", "outcome"])
+tools_in_flight = Gauge("mcp_tools_in_flight", "MCP tool calls currently running", ["tool"])
+admission_rejected = Counter("mcp_admission_rejected_total", "Tool calls shed by admission control", ["lane", "reason"])
+admission_wait = Histogram("mcp_admission_wait_seconds", "Time tool calls waited for an admission slot", ["lane"])
+
+upstream_duration = Histogram("shopify_request_duration_seconds", "Admin API request latency per attempt", ["endpoint", "status"])
+upstream_bytes = Histogram("shopify_response_bytes", "Admin API response body size", ["endpoint"], buckets=BYTES_BUCKETS)
+upstream_retries = Counter("shopify_retries_total", "Admin API retries by reason", ["endpoint", "reason"])
+upstream_throttled = Counter("shopify_throttled_total", "Admin API 429 responses", ["endpoint"])
+upstream_in_flight = Gauge("shopify_requests_in_flight", "Admin API requests currently in flight")
+coalesced = Counter("shopify_coalesced_total", "Lookups that joined an identical in-flight request", ["resource"])
+
+_ID = re.compile(r"/\d+")
+
+
+def endpoint_label(url):
+    """Collapse an Admin API URL into a low-cardinality label, e.g. orders/:id/fulfillment_orders."""
+    path = str(url).split("?", 1)[0]
+    if "/admin/api/" in path:
+        path = path.split("/admin/api/", 1)[1].split("/", 1)[-1]
+    return _ID.sub("/:id", "/" + path).lstrip("/").removesuffix(".json")
+
+
+@contextmanager
+def span(name, **attributes):
+    """OpenTelemetry span when opentelemetry is installed, otherwise a no-op. Spans nest through contextvars."""
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def timed_tool(tool):
+    tools_in_flight.inc(tool=tool)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"tool {tool}", **{"mcp.tool": tool}):
+            yield
+        outcome = "ok"
+    finally:
+        tool_duration.observe(time.perf_counter() - start, tool=tool)
+        tool_calls.inc(tool=tool, outcome=outcome)
+        tools_in_flight.dec(tool=tool)
+
+
+class ToolMetricsMiddleware(MCPMiddleware):
+    """Times every MCP tool call and opens the span the Shopify request spans nest under."""
+
+    async def on_call_tool(self, context, call_next):
+        with timed_tool(context.message.name):
+            return await call_next(context)
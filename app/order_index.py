@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import sqlite3
+import asyncio
+import threading
+import functools
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set ORDER_INDEX_PATH to enable the local index; lookups go live when it is unset
+ORDER_INDEX_PATH = os.getenv("ORDER_INDEX_PATH")
+ORDER_INDEX_SYNC_INTERVAL = float(os.getenv("ORDER_INDEX_SYNC_INTERVAL", "300"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    email TEXT COLLATE NOCASE,
+    customer_id INTEGER,
+    updated_at TEXT,
+    payload TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_orders_name ON orders(name);
+CREATE INDEX IF NOT EXISTS idx_orders_email ON orders(email);
+CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
+CREATE INDEX IF NOT EXISTS idx_orders_updated ON orders(updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Start time of the last incremental sync that completed, the next one's updated_at_min
+SYNC_WATERMARK = "sync_started_at"
+
+
+def utc_timestamp(value):
+    """
+    updated_at in UTC ("2026-09-02T00:00:00+00:00"). REST and webhook payloads
+    carry the shop's offset and bulk exports use Z, so the stored values are
+    normalised before they are compared as strings.
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value).astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def _row(order, complete=True):
+    customer = order.get("customer") or {}
+    return (
+        int(order["id"]),
+        order.get("name"),
+        order.get("email"),
+        customer.get("id"),
+        utc_timestamp(order.get("updated_at")),
+        json.dumps(order, separators=(",", ":")),
+        int(complete),
+    )
+
+
+def _order_name(name):
+    name = str(name)
+    return name if name.startswith("#") else f"#{name}"
+
+
+class OrderIndex:
+    """
+    SQLite index of full order payloads, looked up by order id, order name,
+    email or customer id. Kept current by upserting newer copies of orders.
+
+    Rows stored with complete=False (the bulk backfill's summary records) hold
+    only the summary fields. The id, name and email lookups and iter_orders skip
+    them unless summaries are asked for, so callers that read line items,
+    fulfillments or refunds fall back to the Admin API instead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._migrate()
+
+    def _migrate(self):
+        """Bring an index written before summary rows and UTC timestamps up to date."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(orders)")]
+        if "complete" in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE orders ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+            rows = self._conn.execute("SELECT id, updated_at FROM orders WHERE updated_at IS NOT NULL").fetchall()
+            self._conn.executemany("UPDATE orders SET updated_at = ? WHERE id = ?",
+                                   [(utc_timestamp(updated_at), order_id) for order_id, updated_at in rows])
+
+    def upsert_orders(self, orders, complete=True):
+        """
+        Insert or replace orders unless the stored copy is newer. At the same
+        updated_at a summary row never replaces a complete one.
+        """
+        rows = [_row(order, complete) for order in orders]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO orders (id, name, email, customer_id, updated_at, payload, complete) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name=excluded.name, email=excluded.email, "
+                "customer_id=excluded.customer_id, updated_at=excluded.updated_at, payload=excluded.payload, "
+                "complete=excluded.complete "
+                "WHERE orders.updated_at IS NULL OR excluded.updated_at IS NULL OR excluded.updated_at > orders.updated_at "
+                "OR (excluded.updated_at = orders.updated_at AND excluded.complete >= orders.complete)",
+                rows,
+            )
+        return len(rows)
+
+    def mark_incomplete(self, order_id):
+        """
+        Demote an order to a summary row, e.g. after a fulfillment or refund
+        webhook, so full-order lookups refetch it until a newer copy is upserted.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE orders SET complete = 0 WHERE id = ?", (int(order_id),))
+
+    def _query(self, sql, args):
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute(sql, args)]
+
+    def get_by_id(self, order_id):
+        rows = self._query("SELECT payload FROM orders WHERE id = ? AND complete = 1", (int(order_id),))
+        return rows[0] if rows else None
+
+    def get_by_name(self, name):
+        rows = self._query("SELECT payload FROM orders WHERE name = ? AND complete = 1", (_order_name(name),))
+        return rows[0] if rows else None
+
+    def find_by_email(self, email, summaries=False):
+        """Orders for an email, newest first; with summaries, summary rows are included."""
+        complete = "" if summaries else " AND complete = 1"
+        return self._query(f"SELECT payload FROM orders WHERE email = ?{complete} ORDER BY id DESC", (email,))
+
+    def find_by_customer(self, customer_id):
+        return self._query("SELECT payload FROM orders WHERE customer_id = ? ORDER BY id DESC", (int(customer_id),))
+
+    def iter_orders(self, batch_size=1000):
+        """Yield every complete stored order, reading batch_size rows at a time."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT payload FROM orders WHERE complete = 1 ORDER BY id")
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                yield json.loads(row[0])
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def last_updated_at(self):
+        with self._lock:
+            return self._conn.execute("SELECT MAX(updated_at) FROM orders").fetchone()[0]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+_index = None
+_sync_task = None
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run an index call on a worker thread so SQLite I/O stays off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+def get_index():
+    """Return the shared OrderIndex, or None when ORDER_INDEX_PATH is not configured."""
+    global _index
+    if _index is None and ORDER_INDEX_PATH:
+        _index = OrderIndex(ORDER_INDEX_PATH)
+    return _index
+
+
+def load_file(index, path, batch_size=500):
+    """Bulk-load orders from an export: JSONL (one order per line) or JSON ({"orders": [...]})."""
+    loaded = 0
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            batch = []
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    loaded += index.upsert_orders(batch)
+                    batch = []
+            loaded += index.upsert_orders(batch)
+        else:
+            loaded += index.upsert_orders(json.load(f)["orders"])
+    return loaded
+
+
+async def backfill(index, updated_at_min=None):
+    """
+    Page through orders.json (oldest update first) and upsert every order.
+    With updated_at_min only orders changed since then are fetched, which is
+    how the index is kept current incrementally.
+    """
+    from shopify_client import async_iter_order_pages
+
+    filters = {"order": "updated_at asc"}
+    if updated_at_min:
+        filters["updated_at_min"] = updated_at_min
+    loaded = 0
+    async for page, _ in async_iter_order_pages(filters=filters):
+        loaded += index.upsert_orders(page)
+    return loaded
+
+
+async def sync_incremental(index):
+    """
+    Fetch orders updated since the previous successful sync started. Rows from
+    webhooks and the bulk backfill do not move this watermark, so an update
+    whose webhook was lost is still picked up. An index synced before the
+    watermark existed starts from its newest row once.
+    """
+    started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    updated_at_min = index.get_meta(SYNC_WATERMARK) or index.last_updated_at()
+    synced = await backfill(index, updated_at_min=updated_at_min)
+    index.set_meta(SYNC_WATERMARK, started)
+    return synced
+
+
+async def _sync_forever(index):
+    while True:
+        await asyncio.sleep(ORDER_INDEX_SYNC_INTERVAL)
+        try:
+            synced = await sync_incremental(index)
+            if synced:
+                print(f"order index: synced {synced} updated orders")
+        except Exception as e:
+            print(f"order index sync failed: {e}")
+
+
+_sync_lock = None
+_sync_lock_checked = 0.0
+
+
+def _acquire_sync_lock(path):
+    """
+    Take the index's sync lock file without blocking. Only the worker process
+    holding it runs the periodic sync; the lock is released when that process
+    exits, and another worker picks it up on its next attempt.
+    """
+    global _sync_lock
+    if _sync_lock is None:
+        lock = open(f"{path}.sync.lock", "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        _sync_lock = lock
+    return True
+
+
+def ensure_sync_task():
+    """Start the periodic incremental sync on the running loop, in one process per index file."""
+    global _sync_task, _sync_lock_checked
+    index = get_index()
+    if index is None or ORDER_INDEX_SYNC_INTERVAL <= 0:
+        return
+    if _sync_task is not None and not _sync_task.done():
+        return
+    now = time.monotonic()
+    if _sync_lock is None and now - _sync_lock_checked < ORDER_INDEX_SYNC_INTERVAL:
+        return
+    _sync_lock_checked = now
+    if _acquire_sync_lock(index.path):
+        _sync_task = asyncio.get_running_loop().create_task(_sync_forever(index))
+
+
+if __name__ == "__main__":
+    # python app/order_index.py backfill | sync | load <export.jsonl|export.json>
+    index = get_index()
+    if index is None:
+        sys.exit("ORDER_INDEX_PATH is not set")
+    command = sys.argv[1]
+    if command == "backfill":
+        started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        print(f"loaded {asyncio.run(backfill(index))} orders")
+        index.set_meta(SYNC_WATERMARK, started)
+    elif command == "sync":
+        print(f"synced {asyncio.run(sync_incremental(index))} orders")
+    elif command == "load":
+        print(f"loaded {load_file(index, sys.argv[2])} orders")
+    print(f"index holds {index.count()} orders")
@@ -0,0 +1,206 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import httpx
+import metrics
+
+# Statuses worth retrying; any other 4xx is a caller error and fails immediately
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+CALL_LIMIT_HEADER = "X-Shopify-Shop-Api-Call-Limit"
+
+BASE_DELAY = float(os.getenv("SHOPIFY_RETRY_BASE_DELAY", "0.5"))
+MAX_DELAY = float(os.getenv("SHOPIFY_RETRY_MAX_DELAY", "30"))
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(headers):
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def retry_delay(status_code, headers, attempt):
+    if status_code == 429:
+        retry_after = retry_after_seconds(headers)
+        if retry_after is not None:
+            return retry_after
+    return backoff_delay(attempt)
+
+
+class LeakyBucket:
+    """
+    Client-side model of Shopify's REST leaky bucket. Every request takes one
+    slot and the bucket drains at leak_rate slots per second. Callers reserve a
+    slot before sending and wait until the bucket would be below
+    capacity - headroom, so we stay under the limit instead of reacting to 429s.
+    The level is resynced from X-Shopify-Shop-Api-Call-Limit on every response.
+    """
+
+    def __init__(self, capacity=40, leak_rate=2.0, headroom=2):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.headroom = headroom
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _leak(self, now):
+        self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a slot and return how long to wait before using it."""
+        with self._lock:
+            self._leak(time.monotonic())
+            limit = self.capacity - self.headroom
+            wait = max(0.0, (self.level + 1 - limit) / self.leak_rate)
+            self.level += 1
+            return wait
+
+    def update_from_header(self, value):
+        if not value:
+            return
+        try:
+            used, capacity = (int(part) for part in value.split("/"))
+        except ValueError:
+            return
+        with self._lock:
+            self._leak(time.monotonic())
+            self.capacity = capacity
+            # The server count also covers other clients of the same shop;
+            # keep our own estimate when it is higher (requests still in flight)
+            self.level = max(self.level, float(used))
+
+    def on_throttled(self):
+        with self._lock:
+            self._leak(time.monotonic())
+            self.level = max(self.level, float(self.capacity))
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class NoLimit:
+    """Limiter for calls the REST bucket does not meter, e.g. GraphQL, which is limited by query cost instead."""
+
+    def update_from_header(self, value):
+        pass
+
+    def on_throttled(self):
+        pass
+
+    async def acquire(self):
+        pass
+
+    def acquire_sync(self):
+        pass
+
+
+no_limit = NoLimit()
+
+bucket = LeakyBucket(
+    capacity=int(os.getenv("SHOPIFY_BUCKET_CAPACITY", "40")),
+    leak_rate=float(os.getenv("SHOPIFY_BUCKET_LEAK_RATE", "2")),
+    headroom=int(os.getenv("SHOPIFY_BUCKET_HEADROOM", "2")),
+)
+
+
+@metrics.register_collector
+def _bucket_samples():
+    with bucket._lock:
+        bucket._leak(time.monotonic())
+        level, capacity = bucket.level, bucket.capacity
+    return [
+        ("shopify_bucket_level", "gauge", "Estimated REST leaky-bucket fill level", {}, level),
+        ("shopify_bucket_capacity", "gauge", "REST leaky-bucket capacity", {}, capacity),
+    ]
+
+
+def _observe(limiter, endpoint, status_code, headers, elapsed, size):
+    limiter.update_from_header(headers.get(CALL_LIMIT_HEADER))
+    metrics.upstream_duration.observe(elapsed, endpoint=endpoint, status=status_code)
+    metrics.upstream_bytes.observe(size, endpoint=endpoint)
+    if status_code == 429:
+        limiter.on_throttled()
+        metrics.upstream_throttled.inc(endpoint=endpoint)
+
+
+async def send_with_retry(client, method, url, max_retries=3, limiter=bucket, **kwargs):
+    """
+    Send a request through an httpx.AsyncClient, waiting on the rate limiter
+    first and retrying transport errors and retryable statuses with async
+    sleeps. Non-retryable responses raise httpx.HTTPStatusError straight away.
+    """
+    endpoint = metrics.endpoint_label(url)
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        metrics.upstream_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            with metrics.span(f"shopify {method} {endpoint}", **{"http.method": method, "shopify.attempt": attempt}):
+                response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            metrics.upstream_duration.observe(time.perf_counter() - start, endpoint=endpoint, status="error")
+            if attempt == max_retries:
+                raise
+            metrics.upstream_retries.inc(endpoint=endpoint, reason="transport")
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        finally:
+            metrics.upstream_in_flight.dec()
+        _observe(limiter, endpoint, response.status_code, response.headers,
+                 time.perf_counter() - start, len(response.content))
+        if response.status_code in RETRYABLE_STATUS and attempt < max_retries:
+            metrics.upstream_retries.inc(endpoint=endpoint, reason=response.status_code)
+            await asyncio.sleep(retry_delay(response.status_code, response.headers, attempt))
+            continue
+        response.raise_for_status()
+        return response
+
+
+def send_with_retry_sync(session, method, url, max_retries=3, limiter=bucket, **kwargs):
+    """Blocking counterpart of send_with_retry for requests.Session callers."""
+    import requests
+
+    endpoint = metrics.endpoint_label(url)
+    for attempt in range(max_retries + 1):
+        limiter.acquire_sync()
+        metrics.upstream_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            with metrics.span(f"shopify {method} {endpoint}", **{"http.method": method, "shopify.attempt": attempt}):
+                response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.upstream_duration.observe(time.perf_counter() - start, endpoint=endpoint, status="error")
+            if attempt == max_retries:
+                raise
+            metrics.upstream_retries.inc(endpoint=endpoint, reason="transport")
+            time.sleep(backoff_delay(attempt))
+            continue
+        finally:
+            metrics.upstream_in_flight.dec()
+        _observe(limiter, endpoint, response.status_code, response.headers,
+                 time.perf_counter() - start, len(response.content))
+        if response.status_code in RETRYABLE_STATUS and attempt < max_retries:
+            metrics.upstream_retries.inc(endpoint=endpoint, reason=response.status_code)
+            time.sleep(retry_delay(response.status_code, response.headers, attempt))
+            continue
+        response.raise_for_status()
+        return response
@@ -0,0 +1,46 @@
+"""
+Production server: N uvicorn worker processes serving asgi:app.
+
+    python app/serve.py
+
+WEB_CONCURRENCY       worker processes (default: CPU count; Heroku sets this per dyno size)
+PORT / HOST           bind address (default 0.0.0.0:8000)
+KEEP_ALIVE_TIMEOUT    seconds an idle client connection is kept open (default 75, above typical LB idle timeouts)
+GRACEFUL_TIMEOUT      seconds to let in-flight tool calls finish after SIGTERM (default 25, inside Heroku's 30s)
+MAX_REQUESTS          recycle a worker after this many requests, 0 to disable (default 0)
+
+Each worker has its own in-process response cache and a webhook reaches only
+one of them, so more than one worker needs CACHE_BACKEND=sqlite or redis for
+webhook updates to reach every worker. The order index sync runs in whichever
+worker holds the index's sync lock file.
+"""
+import os
+import uvicorn
+from cache_backend import CACHE_BACKEND
+
+WORKERS = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "75"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "25"))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+
+
+if __name__ == "__main__":
+    if WORKERS > 1 and CACHE_BACKEND == "memory":
+        raise SystemExit(f"WEB_CONCURRENCY={WORKERS} needs CACHE_BACKEND=sqlite or redis: with the in-process "
+                         "cache a webhook would only refresh the worker that received it. "
+                         "Set WEB_CONCURRENCY=1 to run a single worker.")
+    print(f"Starting {WORKERS} workers on {HOST}:{PORT}")
+    uvicorn.run(
+        "asgi:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        limit_max_requests=MAX_REQUESTS or None,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+    )
@@ -0,0 +1,382 @@
+import os
+import asyncio
+import time
+import httpx
+from dotenv import load_dotenv
+from tools import build_status_map, project_order, API_BASE
+from retry import send_with_retry
+from cache import cache, MISSING
+import metrics
+
+load_dotenv()
+
+# Connection pool settings, overridable from the environment
+POOL_MAX_CONNECTIONS = int(os.getenv("SHOPIFY_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SHOPIFY_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("SHOPIFY_POOL_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.getenv("SHOPIFY_REQUEST_TIMEOUT", "30"))
+# TLS certificates are verified; SHOPIFY_VERIFY_TLS=0 turns that off, e.g. behind an intercepting proxy
+VERIFY_TLS = os.getenv("SHOPIFY_VERIFY_TLS", "1") != "0"
+
+# Largest page the REST Admin API serves, and the slim projection used for order searches
+PAGE_LIMIT = 250
+ORDER_SUMMARY_FIELDS = "id,name,email,created_at,processed_at,financial_status,fulfillment_status,cancelled_at,total_price,currency,tags"
+
+# What a support agent needs to answer questions about one order; dotted paths trim nested objects
+ORDER_SUPPORT_FIELDS = ",".join([
+    "id,name,email,created_at,processed_at,financial_status,fulfillment_status,cancelled_at,cancel_reason",
+    "currency,total_price,subtotal_price,total_discounts,tags,note,payment_gateway_names",
+    "discount_codes,shipping_lines.title,shipping_lines.price",
+    "customer.id,customer.first_name,customer.last_name,customer.email",
+    "shipping_address.name,shipping_address.city,shipping_address.province,shipping_address.zip,shipping_address.country_code",
+    "line_items.id,line_items.name,line_items.sku,line_items.variant_id,line_items.quantity",
+    "line_items.current_quantity,line_items.price,line_items.properties,line_items.fulfillment_status",
+    "fulfillments.id,fulfillments.status,fulfillments.shipment_status,fulfillments.tracking_company",
+    "fulfillments.tracking_number,fulfillments.tracking_url,fulfillments.updated_at,fulfillments.line_items.id",
+    "refunds.id,refunds.created_at,refunds.note,refunds.refund_line_items.line_item_id,refunds.refund_line_items.quantity",
+])
+
+# "rest" (default) or "graphql" for the eligibility inputs fetch
+ELIGIBILITY_BACKEND = os.getenv("SHOPIFY_BACKEND", "rest").lower()
+
+_client = None
+_client_loop = None
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_client():
+    """
+    Return the shared AsyncClient, creating it on first use. The client keeps
+    connections to the Admin API alive between calls and speaks HTTP/2 when the
+    h2 package is installed. A new client is built if the running event loop
+    changed, since pooled connections are bound to the loop that opened them.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=http2_available(),
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=REQUEST_TIMEOUT,
+            headers={
+                'Content-Type': 'application/json',
+                'X-Shopify-Access-Token': os.getenv("SHOPIFY_ACCESS_TOKEN") or "",
+            },
+            verify=VERIFY_TLS,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def _get_json(url, params=None, max_retries=3):
+    response = await send_with_retry(get_client(), "GET", url, max_retries=max_retries, params=params)
+    return response.json()
+
+
+# (resource, key) -> (loop, task) for lookups currently being fetched
+_in_flight = {}
+
+
+async def single_flight(resource, key, fetch):
+    """
+    Run fetch() once for concurrent callers asking for the same (resource, key).
+    The first caller starts the fetch and later callers await the same task, so
+    a burst of identical lookups costs one Admin API request. Every waiter gets
+    the result or the exception; a cancelled waiter does not cancel the others.
+    """
+    flight_key = (resource, str(key))
+    loop = asyncio.get_running_loop()
+    entry = _in_flight.get(flight_key)
+    if entry is None or entry[0] is not loop:
+        task = loop.create_task(fetch())
+        entry = (loop, task)
+        _in_flight[flight_key] = entry
+
+        def landed(task, entry=entry):
+            if _in_flight.get(flight_key) is entry:
+                del _in_flight[flight_key]
+            if not task.cancelled():
+                task.exception()  # retrieved here too, in case every waiter was cancelled
+
+        task.add_done_callback(landed)
+    else:
+        metrics.coalesced.inc(resource=resource)
+    return await asyncio.shield(entry[1])
+
+
+async def _cached(resource, key, fetch, refresh=False):
+    """Return the cached value for (resource, key), or fetch it once (see single_flight) and cache it."""
+    if not refresh:
+        value = await cache.aget(resource, key)
+        if value is not MISSING:
+            return value
+
+    async def fetch_and_store():
+        value = await fetch()
+        cache.set(resource, key, value)
+        return value
+
+    return await single_flight(resource, key, fetch_and_store)
+
+
+async def async_get_shopify_data(order_id, max_retries=3, refresh=False):
+    url = f"{API_BASE}/2024-10/orders/{order_id}.json"
+
+    async def fetch():
+        data = await _get_json(url, max_retries=max_retries)
+        return data["order"]
+
+    return await _cached("order", order_id, fetch, refresh)
+
+
+async def async_get_item_status(order_id, max_retries=3, refresh=False):
+    url = f"{API_BASE}/2024-04/orders/{order_id}/fulfillment_orders.json"
+
+    async def fetch():
+        data = await _get_json(url, max_retries=max_retries)
+        return build_status_map(data["fulfillment_orders"])
+
+    return await _cached("fulfillment", order_id, fetch, refresh)
+
+
+async def async_get_customer(customer_id, max_retries=3, refresh=False):
+    url = f"{API_BASE}/2024-04/customers/{customer_id}.json"
+
+    async def fetch():
+        data = await _get_json(url, max_retries=max_retries)
+        return data['customer']
+
+    return await _cached("customer", customer_id, fetch, refresh)
+
+
+async def async_get_order_count(customer_id, max_retries=3, refresh=False):
+    customer = await async_get_customer(customer_id, max_retries=max_retries, refresh=refresh)
+    return customer['orders_count']
+
+
+def _variant_prices(variant):
+    price = float(variant.get("price") or 0)
+    compare_at_price = float(variant["compare_at_price"]) if variant.get("compare_at_price") else 0
+    return price, compare_at_price
+
+
+async def async_get_variant_prices(variant_id, max_retries=3, refresh=False):
+    url = f"{API_BASE}/2024-04/variants/{variant_id}.json"
+
+    async def fetch():
+        data = await _get_json(url, max_retries=max_retries)
+        return data["variant"]
+
+    try:
+        return _variant_prices(await _cached("variant", variant_id, fetch, refresh))
+    except Exception as e:
+        print(f"Error fetching variant {variant_id}: {e}")
+        return None, None
+
+
+async def async_get_variant_prices_batch(line_items, max_retries=3, refresh=False):
+    """
+    Return {variant_id: (price, compare_at_price)} for the variants on an
+    order's line items. Cached variants are reused and the rest are loaded
+    with one products.json?ids= request per PAGE_LIMIT products, never one
+    request per variant. Variants that no longer exist are left out.
+    """
+    wanted = {item["variant_id"] for item in line_items if item.get("variant_id")}
+    variants = {}
+    products = set()
+    for item in line_items:
+        variant_id = item.get("variant_id")
+        if not variant_id or variant_id in variants:
+            continue
+        variant = MISSING if refresh else await cache.aget("variant", variant_id)
+        if variant is not MISSING:
+            variants[variant_id] = variant
+        elif item.get("product_id"):
+            products.add(item["product_id"])
+
+    async def load(ids):
+        async def fetch():
+            data = await _get_json(f"{API_BASE}/2024-04/products.json", max_retries=max_retries,
+                                   params={"ids": ids, "fields": "id,variants", "limit": PAGE_LIMIT})
+            loaded = {}
+            for product in data.get("products", []):
+                for variant in product.get("variants", []):
+                    slim = {"price": variant.get("price"), "compare_at_price": variant.get("compare_at_price")}
+                    cache.set("variant", variant["id"], slim)
+                    loaded[variant["id"]] = slim
+            return loaded
+        return await single_flight("products", ids, fetch)
+
+    products = sorted(products)
+    chunks = [",".join(map(str, products[i:i + PAGE_LIMIT])) for i in range(0, len(products), PAGE_LIMIT)]
+    for loaded in await asyncio.gather(*(load(ids) for ids in chunks)):
+        variants.update(loaded)
+    return {variant_id: _variant_prices(variant) for variant_id, variant in variants.items() if variant_id in wanted}
+
+
+async def async_iter_order_pages(query=None, field='email', fields=None, limit=PAGE_LIMIT,
+                                 max_results=None, cursor=None, max_retries=3, filters=None):
+    """
+    Yield (orders, next_cursor) for each page of an order search, following
+    the Link header cursors. Pass cursor to resume from a previous page; the
+    original filters are carried in the cursor itself. Page sizes shrink on
+    the last page so max_results never splits a page and next_cursor can be
+    used to continue exactly where the results stopped. filters replaces the
+    email/name query with arbitrary orders.json parameters.
+    """
+    url = f"{API_BASE}/2024-10/orders.json"
+    if cursor:
+        params = {"page_info": cursor}
+    elif filters is not None:
+        params = {"status": "any", **filters}
+    else:
+        assert field in ['email', 'name']
+        params = {"status": "any", field: query}
+    if fields:
+        params["fields"] = fields
+    collected = 0
+    while True:
+        page_limit = limit if max_results is None else min(limit, max_results - collected)
+        if page_limit <= 0:
+            return
+        params["limit"] = page_limit
+        try:
+            response = await send_with_retry(get_client(), "GET", url, max_retries=max_retries, params=params)
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to search orders: {str(e)}")
+        orders = response.json().get("orders", [])
+        next_url = response.links.get("next", {}).get("url")
+        next_cursor = httpx.URL(next_url).params.get("page_info") if next_url else None
+        collected += len(orders)
+        yield orders, next_cursor
+        if not next_cursor:
+            return
+        params = {"page_info": next_cursor}
+        if fields:
+            params["fields"] = fields
+
+
+async def async_search_orders(query=None, field='email', fields=None, max_results=None, cursor=None):
+    """Collect every page of an order search. Returns (orders, next_cursor)."""
+    orders = []
+    next_cursor = None
+    async for page, next_cursor in async_iter_order_pages(query, field, fields=fields,
+                                                          max_results=max_results, cursor=cursor):
+        orders.extend(page)
+    return orders, next_cursor
+
+
+async def async_search_orders_by_email_or_name(query, field='email', max_retries=3):
+    orders = []
+    async for page, _ in async_iter_order_pages(query, field, max_retries=max_retries):
+        orders.extend(page)
+    return orders
+
+
+async def async_find_order_by_name(name, refresh=False, fields=None):
+    """
+    Look up a single order by its name (e.g. '#12345'). Returns None if not found.
+    The order is cached under its id as well, so a following eligibility check
+    for the same order does not download it again.
+
+    With fields (dotted paths allowed, see project_order) only those fields
+    are returned. They are always projected locally from the full order:
+    asking Shopify for just those fields would download less, but the partial
+    order could not be cached, and the eligibility check that usually follows
+    a details lookup would download the whole order again.
+    """
+    if not name.startswith("#"):
+        name = f"#{name}"
+    if not refresh:
+        order_id = await cache.aget("order_name", name)
+        if order_id is not MISSING:
+            order = await cache.aget("order", order_id)
+            if order is not MISSING:
+                return order if fields is None else project_order(order, fields)
+
+    async def fetch():
+        orders = await async_search_orders_by_email_or_name(name, field='name')
+        if not orders:
+            return None
+        order = orders[0]
+        cache.set("order", order["id"], order)
+        cache.set("order_name", name, order["id"], size=0)
+        return order
+
+    order = await single_flight("order_name", name, fetch)
+    return order if order is None or fields is None else project_order(order, fields)
+
+
+async def async_fetch_eligibility_inputs(order_id, refresh=False, customer_tasks=None):
+    """
+    Fetch (order_data, status_map, order_count, timings) for an order using the
+    backend selected by SHOPIFY_BACKEND. The GraphQL backend falls back to the
+    REST pipeline if its query fails. customer_tasks, when given, is a dict
+    shared across calls so orders of the same customer reuse one lookup.
+    """
+    if ELIGIBILITY_BACKEND == "graphql":
+        from graphql_backend import async_fetch_eligibility_inputs_graphql
+        try:
+            return await async_fetch_eligibility_inputs_graphql(order_id, refresh=refresh)
+        except Exception as e:
+            print(f"GraphQL eligibility fetch failed for {order_id}, falling back to REST: {e}")
+    return await async_fetch_eligibility_inputs_rest(order_id, refresh=refresh, customer_tasks=customer_tasks)
+
+
+async def _shared_order_count(customer_id, refresh, customer_tasks):
+    if customer_tasks is None:
+        return await async_get_order_count(customer_id, refresh=refresh)
+    task = customer_tasks.get(customer_id)
+    if task is None:
+        task = asyncio.ensure_future(async_get_order_count(customer_id, refresh=refresh))
+        customer_tasks[customer_id] = task
+    return await asyncio.shield(task)
+
+
+async def async_fetch_eligibility_inputs_rest(order_id, refresh=False, customer_tasks=None):
+    """
+    Fetch the order, its fulfillment statuses and the customer's order count
+    over REST. The fulfillment-orders request runs alongside the order request and the customer request starts
+    as soon as the order payload arrives. Cached responses are reused unless
+    refresh is set.
+    """
+    timings = {}
+
+    async def timed(name, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    status_task = asyncio.create_task(timed("fulfillment_orders_ms", async_get_item_status(order_id, refresh=refresh)))
+    try:
+        order_data = await timed("order_ms", async_get_shopify_data(order_id, refresh=refresh))
+        customer_id = order_data['customer']['id']
+        order_count = await timed("customer_ms", _shared_order_count(customer_id, refresh, customer_tasks))
+        status_map = await status_task
+    finally:
+        if not status_task.done():
+            status_task.cancel()
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return order_data, status_map, order_count, timings
@@ -0,0 +1,75 @@
+"""
+Preload the shared response cache with recently active orders, so a fresh
+deploy does not send every first lookup to the Admin API.
+
+    CACHE_BACKEND=redis CACHE_REDIS_URL=... python app/warm_cache.py --hours 48 --limit 500
+
+Orders updated in the last --hours are cached by id and name together with
+their fulfillment status, customer and variant prices, i.e. everything
+get_order_eligibility reads. Requests go through the usual rate limiter.
+"""
+import asyncio
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from cache import cache  # noqa: E402
+from shopify_client import (  # noqa: E402
+    async_iter_order_pages, async_get_item_status, async_get_customer, async_get_variant_prices_batch,
+    close_client,
+)
+
+WARM_CONCURRENCY = 4
+
+
+async def warm(hours=24, limit=500, variants=True, concurrency=WARM_CONCURRENCY):
+    """Cache orders updated in the last hours (newest first, at most limit) and their related lookups."""
+    updated_at_min = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+    filters = {"updated_at_min": updated_at_min, "order": "updated_at desc"}
+    semaphore = asyncio.Semaphore(concurrency)
+    customers = set()
+    counts = {"orders": 0, "failed": 0}
+
+    async def related(order):
+        async with semaphore:
+            try:
+                await async_get_item_status(order["id"])
+                customer_id = (order.get("customer") or {}).get("id")
+                if customer_id and customer_id not in customers:
+                    customers.add(customer_id)
+                    await async_get_customer(customer_id)
+                if variants:
+                    await async_get_variant_prices_batch(order["line_items"])
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"warm: {order.get('name')} failed: {e}")
+
+    tasks = []
+    async for page, _ in async_iter_order_pages(filters=filters, max_results=limit):
+        for order in page:
+            cache.set("order", order["id"], order)
+            cache.set("order_name", order["name"], order["id"], size=0)
+            counts["orders"] += 1
+            tasks.append(asyncio.create_task(related(order)))
+    await asyncio.gather(*tasks)
+    await close_client()
+    cache.flush()
+    counts["customers"] = len(customers)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preload the shared response cache with recently active orders")
+    parser.add_argument("--hours", type=float, default=24, help="orders updated within this many hours")
+    parser.add_argument("--limit", type=int, default=500, help="at most this many orders, newest first")
+    parser.add_argument("--no-variants", action="store_true", help="skip variant prices")
+    args = parser.parse_args()
+    if cache.backend is None:
+        raise SystemExit("CACHE_BACKEND is memory; set it to sqlite or redis so the warmed entries outlive this process")
+    start = time.perf_counter()
+    counts = asyncio.run(warm(args.hours, args.limit, variants=not args.no_variants))
+    print(f"warmed {counts['orders']} orders and {counts['customers']} customers "
+          f"({counts['failed']} failed) in {time.perf_counter() - start:.1f}s")
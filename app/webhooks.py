@@ -0,0 +1,144 @@
+import os
+import sys
+import hmac
+import json
+import base64
+import hashlib
+from datetime import datetime
+from starlette.responses import JSONResponse
+from cache import cache
+from order_index import get_index, run_blocking
+
+
+def get_webhook_secret():
+    return os.getenv("SHOPIFY_WEBHOOK_SECRET")
+
+
+def compute_hmac(body, secret):
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def verify_hmac(body, signature, secret):
+    if not (signature and secret):
+        return False
+    return hmac.compare_digest(compute_hmac(body, secret), signature)
+
+
+def parse_updated_at(value):
+    """updated_at as an aware datetime, so values with different UTC offsets compare correctly."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def is_older(payload, cached):
+    """True when the cached copy is known to be newer than the payload. Shopify may deliver webhooks out of order."""
+    if not isinstance(cached, dict):
+        return False
+    incoming, current = parse_updated_at(payload.get("updated_at")), parse_updated_at(cached.get("updated_at"))
+    return incoming is not None and current is not None and incoming < current
+
+
+async def customer_order_ids(customer_id, payload):
+    """Ids of the customer's orders this instance may hold eligibility entries for."""
+    def belongs(order):
+        return ((order or {}).get("customer") or {}).get("id") == customer_id
+
+    ids = set(cache.keys_where("order", belongs))
+    ids.update(cache.keys_where("eligibility", lambda value: belongs(value[0])))
+    if payload.get("last_order_id"):
+        ids.add(str(payload["last_order_id"]))
+    index = get_index()
+    if index is not None:
+        ids.update(str(order["id"]) for order in await run_blocking(index.find_by_customer, customer_id))
+    return ids
+
+
+async def mark_index_stale(order_id):
+    """The index row no longer reflects tracking or refunds; get_order_details_by_order_id reads the index first."""
+    index = get_index()
+    if index is not None:
+        await run_blocking(index.mark_incomplete, order_id)
+
+
+async def apply_webhook(topic, payload):
+    """
+    Update the response cache from a webhook payload. Full order and customer
+    payloads are upserted unless the cached copy is newer; events that only
+    reference an order drop the cached copies so the next lookup refetches
+    them. Returns a short description of what was done.
+    """
+    if topic == "orders/updated":
+        order_id = payload["id"]
+        if is_older(payload, await cache.aget("order", order_id)):
+            return f"skipped order {order_id}, cached copy is newer"
+        cache.set("order", order_id, payload)
+        if payload.get("name"):
+            cache.set("order_name", payload["name"], order_id, size=0)
+        cache.invalidate("fulfillment", order_id)
+        cache.invalidate("eligibility", order_id)
+        index = get_index()
+        if index is not None:
+            await run_blocking(index.upsert_orders, [payload])
+        return f"upserted order {order_id}"
+    if topic == "fulfillments/update":
+        order_id = payload["order_id"]
+        cache.invalidate("order", order_id)
+        cache.invalidate("fulfillment", order_id)
+        cache.invalidate("eligibility", order_id)
+        await mark_index_stale(order_id)
+        return f"invalidated order {order_id}"
+    if topic == "refunds/create":
+        order_id = payload["order_id"]
+        cache.invalidate("order", order_id)
+        cache.invalidate("eligibility", order_id)
+        await mark_index_stale(order_id)
+        return f"invalidated order {order_id}"
+    if topic == "customers/update":
+        customer_id = payload["id"]
+        if is_older(payload, await cache.aget("customer", customer_id)):
+            return f"skipped customer {customer_id}, cached copy is newer"
+        cache.set("customer", customer_id, payload)
+        # Eligibility entries embed the customer's order count
+        order_ids = await customer_order_ids(customer_id, payload)
+        for order_id in order_ids:
+            cache.invalidate("eligibility", order_id)
+        return f"upserted customer {customer_id}, invalidated eligibility for {len(order_ids)} orders"
+    return "ignored"
+
+
+async def handle_webhook(request):
+    body = await request.body()
+    if not verify_hmac(body, request.headers.get("X-Shopify-Hmac-Sha256"), get_webhook_secret()):
+        return JSONResponse({"error": "invalid signature"}, status_code=401)
+    topic = request.headers.get("X-Shopify-Topic", "")
+    try:
+        payload = json.loads(body)
+        result = await apply_webhook(topic, payload)
+    except (ValueError, KeyError, TypeError) as e:
+        return JSONResponse({"error": f"bad payload: {e}"}, status_code=400)
+    print(f"webhook {topic}: {result}")
+    return JSONResponse({"ok": True, "result": result})
+
+
+def post_signed_webhook(url, topic, payload, secret):
+    """Post a payload signed the way Shopify signs it. Used to exercise the endpoint locally."""
+    import httpx
+
+    body = json.dumps(payload).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "X-Shopify-Topic": topic,
+        "X-Shopify-Hmac-Sha256": compute_hmac(body, secret),
+    }
+    return httpx.post(url, content=body, headers=headers)
+
+
+if __name__ == "__main__":
+    # python app/webhooks.py <url> <topic> <payload.json>
+    from dotenv import load_dotenv
+    load_dotenv()
+    url, topic, path = sys.argv[1:4]
+    with open(path) as f:
+        payload = json.load(f)
+    response = post_signed_webhook(url, topic, payload, get_webhook_secret())
+    print(response.status_code, response.text)
@@ -0,0 +1,64 @@
+"""
+Benchmark for the vectorized eligibility engine.
+
+Times process_order_items against flatten_orders + compute_eligibility over a
+large synthetic order set. Parity between the two is checked by
+tests/test_bulk_eligibility.py, which reuses synthetic_orders from here.
+
+    python benchmarks/bench_bulk_eligibility.py [orders]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from tools import process_order_items  # noqa: E402
+from bulk_eligibility import flatten_orders, compute_eligibility  # noqa: E402
+from bench_process_order_items import synthetic_order  # noqa: E402
+
+
+# Synthetic lines sell at 120.00; compare-at prices above that are markdowns of 4% to 40%
+COMPARE_AT_PRICES = [0, 0, 100.0, 125.0, 150.0, 200.0]
+
+
+def synthetic_orders(count, seed=1):
+    """Synthetic orders plus the {variant_id: (price, compare_at_price)} map their lines point into."""
+    rng = random.Random(seed)
+    variant_prices = {i: (120.0, price) for i, price in enumerate(COMPARE_AT_PRICES)}
+    orders = []
+    for n in range(count):
+        order = synthetic_order(rng.randint(1, 8), seed=n)
+        order["id"] = n
+        order["name"] = f"#{n}"
+        order["payment_gateway_names"] = [rng.choice(["shopify_payments", "shopify_payments", "Klarna", "Afterpay"])]
+        for item in order["line_items"]:
+            item["variant_id"] = rng.randrange(len(COMPARE_AT_PRICES))
+        orders.append(order)
+    return orders, variant_prices
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    orders, variant_prices = synthetic_orders(count)
+    start = time.perf_counter()
+    scalar = [row["eligibility_status"] for order in orders
+              for row in process_order_items(order, {}, 1, variant_prices)]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = flatten_orders(orders, variant_prices)
+    flatten_s = time.perf_counter() - start
+    start = time.perf_counter()
+    frame = compute_eligibility(frame)
+    vector_s = time.perf_counter() - start
+
+    print(f"{len(scalar)} line items from {count} orders")
+    print(f"scalar (process_order_items): {scalar_s * 1000:8.1f} ms")
+    print(f"flatten to DataFrame:         {flatten_s * 1000:8.1f} ms")
+    print(f"vectorized eligibility:       {vector_s * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
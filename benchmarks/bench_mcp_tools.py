@@ -0,0 +1,163 @@
+"""
+End-to-end MCP tool benchmark against the local fake Admin API.
+
+Starts benchmarks/fake_admin_api.py and app/main.py as subprocesses, points
+the server at the fake with SHOPIFY_ADMIN_BASE_URL, then drives
+get_order_eligibility, search_orders_by_email and get_order_details_by_order_id
+through a real streamable-http MCP client at each concurrency level and
+reports p50/p99 latency and throughput per tool.
+
+    python benchmarks/bench_mcp_tools.py --concurrency 1,8,32 --requests 200 --latency-ms 80 --jitter-ms 40
+    python benchmarks/bench_mcp_tools.py --cold --throttle-rate 0.02 --error-rate 0.01
+
+--cold sets every cache TTL to 0 so each call goes upstream; without it the
+numbers include the response cache, which warms up over the run. The
+server's rate limiter and the fake's call limit both leak at --leak-rate
+(Shopify's standard 2/s by default), so cold throughput is bounded by it;
+raise it to measure the server itself rather than the API budget.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+import httpx
+from fastmcp import Client
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_admin_api import FIRST_ORDER_ID, order_name, customer_email  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TOOLS = ("get_order_eligibility", "search_orders_by_email", "get_order_details_by_order_id")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_processes(args):
+    api_port, mcp_port = free_port(), free_port()
+    fake = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "benchmarks", "fake_admin_api.py"),
+        "--port", str(api_port), "--orders", str(args.orders),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+        "--leak-rate", str(args.leak_rate),
+    ])
+    env = {**os.environ, "PORT": str(mcp_port),
+           "SHOPIFY_ADMIN_BASE_URL": f"http://127.0.0.1:{api_port}/admin/api",
+           "SHOPIFY_ACCESS_TOKEN": "offline-benchmark", "SHOPIFY_BUCKET_LEAK_RATE": str(args.leak_rate)}
+    env.pop("ORDER_INDEX_PATH", None)
+    if args.cold:
+        env.update({f"CACHE_TTL_{resource}": "0" for resource in
+                    ("ORDER", "ORDER_NAME", "FULFILLMENT", "ELIGIBILITY", "CUSTOMER", "VARIANT")})
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "app", "main.py")], env=env,
+                              cwd=os.path.join(ROOT, "app"),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for(f"http://127.0.0.1:{api_port}/_stats")
+    wait_for(f"http://127.0.0.1:{mcp_port}/metrics")
+    return [fake, server], f"http://127.0.0.1:{mcp_port}/mcp"
+
+
+def tool_arguments(tool, n, orders):
+    i = n % orders
+    if tool == "get_order_eligibility":
+        return {"order_id": str(FIRST_ORDER_ID + i)}
+    if tool == "search_orders_by_email":
+        return {"email": customer_email(i // 4)}
+    return {"order_id": order_name(i)}
+
+
+def is_error_payload(result):
+    """True for {"error": ...} or {"success": false} results, whether returned as structured content or JSON text."""
+    data = result.structured_content
+    if data is None and result.content:
+        try:
+            data = json.loads(result.content[0].text)
+        except (ValueError, AttributeError):
+            data = None
+    return isinstance(data, dict) and (bool(data.get("error")) or data.get("success") is False)
+
+
+async def run_level(url, tool, concurrency, requests, orders):
+    """Send requests calls of tool over concurrency client sessions; return (latencies, errors, wall seconds)."""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        async with Client(url) as client:
+            for n in counter:
+                start = time.perf_counter()
+                result = await client.call_tool(tool, tool_arguments(tool, n, orders), raise_on_error=False)
+                latencies.append(time.perf_counter() - start)
+                if result.is_error or is_error_payload(result):
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(url, args):
+    print(f"{'tool':<32} {'conc':>5} {'calls':>6} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'calls/s':>8}")
+    for tool in args.tools:
+        for concurrency in args.concurrency:
+            latencies, errors, wall = await run_level(url, tool, concurrency, args.requests, args.orders)
+            print(f"{tool:<32} {concurrency:>5} {len(latencies):>6} {errors:>6} "
+                  f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+                  f"{statistics.mean(latencies) * 1000:>8.1f} {len(latencies) / wall:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="calls per tool and concurrency level")
+    parser.add_argument("--tools", default=",".join(TOOLS))
+    parser.add_argument("--orders", type=int, default=500, help="orders in the fake store")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--leak-rate", type=float, default=2.0, help="Admin API calls per second the server may sustain")
+    parser.add_argument("--cold", action="store_true", help="disable the response cache in the server")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    args.tools = args.tools.split(",")
+
+    processes, url = start_processes(args)
+    try:
+        asyncio.run(run(url, args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
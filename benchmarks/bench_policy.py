@@ -0,0 +1,57 @@
+"""
+Evaluation cost of the compiled return-policy rules.
+
+Times get_eligibility (compiled rule table) against the hand-written if-chain
+it replaced, over a mix of inputs that reach every rule.
+
+    python benchmarks/bench_policy.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from tools import get_eligibility  # noqa: E402
+from policy import get_policy  # noqa: E402
+
+
+def hand_written_status(is_final_sale, days_held, discount_pct, has_discount, payment_method):
+    if is_final_sale:
+        return "FINAL_SALE"
+    if days_held is not None and days_held > 30:
+        return "EXPIRED"
+    if payment_method != 'Normal':
+        return "CREDIT_ONLY_PAYMENT_METHOD"
+    if discount_pct > 20:
+        return "DISCOUNT_GT_20"
+    if has_discount:
+        return "DISCOUNT_LE_20"
+    return "FULL_PRICE"
+
+
+INPUTS = [
+    (True, 3, 0, False, 'Normal'),
+    (False, 45, 0, False, 'Normal'),
+    (False, 3, 0, False, 'Klarna'),
+    (False, None, 30, True, 'Normal'),
+    (False, 10, 15, True, 'Normal'),
+    (False, 10, 0, False, 'Normal'),
+]
+
+
+def main():
+    for args in INPUTS:
+        assert get_eligibility(*args[:4], 1, args[4], "AU")[0] == hand_written_status(*args)
+    number = 200_000
+    compiled = min(timeit.repeat(lambda: [get_eligibility(f, d, p, h, 1, m, "AU") for f, d, p, h, m in INPUTS],
+                                 number=number // len(INPUTS), repeat=3))
+    chain = min(timeit.repeat(lambda: [hand_written_status(*args) for args in INPUTS],
+                              number=number // len(INPUTS), repeat=3))
+    print(f"compiled rule table: {compiled / number * 1e9:7.0f} ns per evaluation (including reload check)")
+    print(f"status-only chain:   {chain / number * 1e9:7.0f} ns per evaluation (lower bound)")
+    print(f"policy stats: {get_policy().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for process_order_items on large synthetic orders.
+
+Compares the indexed implementation in app/tools.py against the previous
+per-line-item scan of every fulfillment and refund, checks that both produce
+identical output, and prints how the cost grows with order size.
+
+    python benchmarks/bench_process_order_items.py
+"""
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from tools import process_order_items, process_line_item, get_payment_method  # noqa: E402
+
+
+def legacy_process_order_items(order, statuses, order_count):
+    """The pre-index algorithm: rescans fulfillments and refunds for every line item."""
+    fulfillments = order.get("fulfillments", [])
+    refunds = order.get("refunds", [])
+    payment_method = get_payment_method(order)
+    country_code = order.get("shipping_address").get('country_code')
+    results = []
+    for item in order['line_items']:
+        if item['current_quantity'] > 0:
+            item_id = item['id']
+            has_order_discount = len(order.get("discount_codes", [])) > 0
+            delivered_at = None
+            for f in fulfillments:
+                for f_item in f.get("line_items", []):
+                    if f_item['id'] == item_id and f.get("shipment_status") == "delivered":
+                        delivered_at = f.get("updated_at")
+            was_returned = any(
+                item_id == refund_line_item.get("line_item_id")
+                for refund in refunds
+                for refund_line_item in refund.get("refund_line_items", [])
+            )
+            delivered = {item_id: delivered_at} if delivered_at else {}
+            refunded = {item_id} if was_returned else set()
+            results.append(process_line_item(item, statuses, order_count, delivered, refunded,
+                                             payment_method, country_code, has_order_discount))
+    return results
+
+
+def synthetic_order(lines, seed=0):
+    rng = random.Random(seed)
+    line_items = []
+    for i in range(lines):
+        properties = []
+        if rng.random() < 0.3:
+            pct = rng.choice([10, 15, 25, 40])
+            properties += [{"name": "_Discount_Amount", "value": str(pct)},
+                           {"name": "_Discount_Percentage", "value": f"{pct}%"}]
+        if rng.random() < 0.05:
+            properties.append({"name": "note", "value": "Final Sale"})
+        qty = rng.randint(1, 3)
+        line_items.append({
+            "id": 10_000 + i, "name": f"Item {i}", "sku": f"SKU{i}",
+            "quantity": qty, "current_quantity": qty, "price": "120.00",
+            "price_set": {"presentment_money": {"amount": "120.00", "currency_code": "AUD"}},
+            "discount_allocations": [{"amount_set": {"presentment_money": {"amount": "5.00"}}}],
+            "properties": properties,
+        })
+    ids = [item["id"] for item in line_items]
+    # Many partial fulfillments and refunds, as on wholesale and bundle orders
+    fulfillments = [
+        {"shipment_status": rng.choice(["delivered", "in_transit"]),
+         "updated_at": f"2026-09-{rng.randint(1, 28):02d}T10:00:00+10:00",
+         "line_items": [{"id": i} for i in rng.sample(ids, min(4, len(ids)))]}
+        for _ in range(max(1, lines // 2))
+    ]
+    refunds = [
+        {"refund_line_items": [{"line_item_id": i} for i in rng.sample(ids, min(2, len(ids)))]}
+        for _ in range(max(1, lines // 5))
+    ]
+    return {
+        "line_items": line_items, "fulfillments": fulfillments, "refunds": refunds,
+        "discount_codes": [{"code": "WELCOME"}], "payment_gateway_names": ["shopify_payments"],
+        "shipping_address": {"country_code": "AU"},
+    }
+
+
+def main():
+    print(f"{'lines':>6} {'legacy ms':>10} {'indexed ms':>11} {'speedup':>8}")
+    for lines in (10, 50, 200, 1000):
+        order = synthetic_order(lines)
+        statuses = {item["id"]: "closed" for item in order["line_items"]}
+        assert process_order_items(order, statuses, 3) == legacy_process_order_items(order, statuses, 3)
+        number = max(1, 2000 // lines)
+        legacy = min(timeit.repeat(lambda: legacy_process_order_items(order, statuses, 3), number=number, repeat=3)) / number
+        indexed = min(timeit.repeat(lambda: process_order_items(order, statuses, 3), number=number, repeat=3)) / number
+        print(f"{lines:>6} {legacy * 1000:>10.3f} {indexed * 1000:>11.3f} {legacy / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
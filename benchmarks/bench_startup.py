@@ -0,0 +1,115 @@
+"""
+Cold-start measurement for the MCP server.
+
+1. Import profile: runs `python -X importtime -c "import main"` in a fresh
+   interpreter and prints the total plus the heaviest top-level imports.
+2. Time to first response: starts the fake Admin API, then launches
+   app/main.py and times how long until it accepts connections and until
+   the first get_order_eligibility call returns.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+import httpx
+from fastmcp import Client
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_mcp_tools import ROOT, free_port, wait_for  # noqa: E402
+from fake_admin_api import FIRST_ORDER_ID  # noqa: E402
+
+APP_DIR = os.path.join(ROOT, "app")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile():
+    """Return (total_us, [(cumulative_us, module)]) for the modules main imports directly."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=APP_DIR, capture_output=True, text=True)
+    total, top = 0, []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, module = int(match[2]), len(match[3]), match[4]
+        # children are reported before their parent, so keep the direct children seen since the last top-level import
+        if module == "main":
+            total = cumulative
+            break
+        if depth == 1:
+            top = []
+        elif depth == 3:
+            top.append((cumulative, module))
+    return total, sorted(top, reverse=True)
+
+
+async def first_response(url, order_id, deadline):
+    while time.monotonic() < deadline:
+        try:
+            async with Client(url) as client:
+                return await client.call_tool("get_order_eligibility", {"order_id": order_id})
+        except Exception:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("server did not answer in time")
+
+
+def time_to_first_response(api_url):
+    port = free_port()
+    env = {**os.environ, "PORT": str(port), "SHOPIFY_ADMIN_BASE_URL": api_url,
+           "SHOPIFY_ACCESS_TOKEN": "offline-benchmark"}
+    env.pop("ORDER_INDEX_PATH", None)
+    start = time.monotonic()
+    server = subprocess.Popen([sys.executable, os.path.join(APP_DIR, "main.py")], env=env, cwd=APP_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.02)
+        listening = time.monotonic() - start
+        asyncio.run(first_response(f"http://127.0.0.1:{port}/mcp", str(FIRST_ORDER_ID), start + 60))
+        return listening, time.monotonic() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    total, top = min(profiles)
+    print(f"import main: {total / 1000:.0f} ms (best of {args.runs})")
+    for cumulative, module in top[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {module}")
+
+    api_port = free_port()
+    fake = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "fake_admin_api.py"),
+                             "--port", str(api_port), "--orders", "10"])
+    try:
+        wait_for(f"http://127.0.0.1:{api_port}/_stats")
+        samples = [time_to_first_response(f"http://127.0.0.1:{api_port}/admin/api") for _ in range(args.runs)]
+    finally:
+        fake.terminate()
+        fake.wait()
+    listening = [s[0] for s in samples]
+    first = [s[1] for s in samples]
+    print(f"listening:        median {statistics.median(listening) * 1000:.0f} ms, max {max(listening) * 1000:.0f} ms")
+    print(f"first tool reply: median {statistics.median(first) * 1000:.0f} ms, max {max(first) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Local fake of the Shopify Admin REST API for offline benchmarks.
+
+Serves the endpoints the MCP tools call, under /admin/api/<version>/:
+
+    orders/<id>.json                     orders/<id>/fulfillment_orders.json
+    customers/<id>.json                  variants/<id>.json
+    products.json?ids=&fields=
+    orders.json?email=|name=&limit=&fields=&page_info=   (Link header cursors)
+
+Orders are generated deterministically (synthetic_order from
+bench_process_order_items), several per customer email. Latency, 5xx errors
+and 429s can be injected, and every response carries an
+X-Shopify-Shop-Api-Call-Limit header from a simulated leaky bucket.
+
+    python benchmarks/fake_admin_api.py --port 8900 --latency-ms 80 --jitter-ms 40 --error-rate 0.01 --throttle-rate 0.02
+    SHOPIFY_ADMIN_BASE_URL=http://127.0.0.1:8900/admin/api python app/main.py
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_process_order_items import synthetic_order  # noqa: E402
+
+FIRST_ORDER_ID = 5_000_000_000
+FIRST_CUSTOMER_ID = 7_000_000_000
+
+
+def order_name(i):
+    return f"#{10001 + i}"
+
+
+def customer_email(c):
+    return f"customer{c}@example.com"
+
+
+def build_store(orders=500, orders_per_customer=4, lines=4, seed=0):
+    """Return the fake store: orders, fulfillment orders, customers and variants keyed by id."""
+    store = {"orders": {}, "fulfillment_orders": {}, "customers": {}, "variants": {}, "by_email": {}, "by_name": {}}
+    for i in range(orders):
+        order_id = FIRST_ORDER_ID + i
+        c = i // orders_per_customer
+        customer_id = FIRST_CUSTOMER_ID + c
+        order = synthetic_order(lines, seed=seed + i)
+        for n, item in enumerate(order["line_items"]):
+            item["id"] = order_id * 100 + n
+            item["variant_id"] = 40_000_000_000 + (i * lines + n) % 200
+            item["product_id"] = 8_000_000_000 + (i * lines + n) % 200 // 3
+        order_ids = [item["id"] for item in order["line_items"]]
+        for f in order["fulfillments"]:
+            f["line_items"] = [{"id": order_ids[x["id"] - 10_000]} for x in f["line_items"]]
+        for refund in order["refunds"]:
+            for line in refund["refund_line_items"]:
+                line["line_item_id"] = order_ids[line["line_item_id"] - 10_000]
+        total = sum(float(item["price"]) * item["quantity"] for item in order["line_items"])
+        order.update({
+            "id": order_id, "name": order_name(i), "email": customer_email(c),
+            "created_at": "2026-09-01T10:00:00+10:00", "processed_at": "2026-09-01T10:00:00+10:00",
+            "updated_at": "2026-09-02T10:00:00+10:00", "cancelled_at": None,
+            "financial_status": "paid", "fulfillment_status": "fulfilled", "tags": "",
+            "currency": "AUD", "total_price": f"{total:.2f}",
+            "total_price_set": {"presentment_money": {"amount": f"{total:.2f}", "currency_code": "AUD"}},
+            "customer": {"id": customer_id}, "billing_address": {"name": f"Customer {c}"},
+        })
+        store["orders"][order_id] = order
+        store["by_name"][order["name"]] = order_id
+        store["by_email"].setdefault(order["email"], []).append(order_id)
+        store["fulfillment_orders"][order_id] = [
+            {"status": "closed", "line_items": [{"line_item_id": line_id} for line_id in order_ids]}
+        ]
+        store["customers"].setdefault(customer_id, {"id": customer_id, "email": order["email"], "orders_count": 0})
+        store["customers"][customer_id]["orders_count"] += 1
+    store["products"] = {}
+    for n in range(200):
+        variant_id = 40_000_000_000 + n
+        variant = {"id": variant_id, "price": "120.00", "compare_at_price": "160.00" if n % 3 == 0 else None}
+        store["variants"][variant_id] = variant
+        product_id = 8_000_000_000 + n // 3
+        store["products"].setdefault(product_id, {"id": product_id, "variants": []})["variants"].append(variant)
+    return store
+
+
+class CallLimit:
+    """Simulated REST leaky bucket, reported the way Shopify reports it."""
+
+    def __init__(self, capacity=40, leak_rate=2.0):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+        self.updated = now
+        if self.level + 1 > self.capacity:
+            return False
+        self.level += 1
+        return True
+
+    def header(self):
+        return f"{int(self.level)}/{self.capacity}"
+
+
+def _project(order, fields):
+    if not fields:
+        return order
+    return {key: order[key] for key in fields.split(",") if key in order}
+
+
+def _encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+def create_app(store, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+               enforce_bucket=False, leak_rate=2.0, seed=0):
+    """
+    Build the Starlette app. error_rate and throttle_rate are per-request
+    probabilities of a 503 or a 429 (with Retry-After); with enforce_bucket
+    a 429 is also returned whenever the simulated bucket is full.
+    """
+    rng = random.Random(seed)
+    bucket = CallLimit(leak_rate=leak_rate)
+    counters = {"requests": 0, "errors": 0, "throttled": 0}
+
+    async def respond(payload, headers=None):
+        counters["requests"] += 1
+        delay = latency_ms + rng.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        allowed = bucket.take()
+        limit_header = {"X-Shopify-Shop-Api-Call-Limit": bucket.header()}
+        if rng.random() < throttle_rate or (enforce_bucket and not allowed):
+            counters["throttled"] += 1
+            return JSONResponse({"errors": "Exceeded 2 calls per second for api client. Reduce request rates to resume uninterrupted service."},
+                                status_code=429, headers={"Retry-After": "1.0", **limit_header})
+        if rng.random() < error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"errors": "Service Unavailable"}, status_code=503, headers=limit_header)
+        if payload is None:
+            return JSONResponse({"errors": "Not Found"}, status_code=404, headers=limit_header)
+        return JSONResponse(payload, headers={**limit_header, **(headers or {})})
+
+    async def order(request):
+        found = store["orders"].get(int(request.path_params["order_id"]))
+        return await respond(found and {"order": _project(found, request.query_params.get("fields"))})
+
+    async def fulfillment_orders(request):
+        found = store["fulfillment_orders"].get(int(request.path_params["order_id"]))
+        return await respond(None if found is None else {"fulfillment_orders": found})
+
+    async def customer(request):
+        found = store["customers"].get(int(request.path_params["customer_id"]))
+        return await respond(found and {"customer": found})
+
+    async def variant(request):
+        found = store["variants"].get(int(request.path_params["variant_id"]))
+        return await respond(found and {"variant": found})
+
+    async def products(request):
+        ids = [int(i) for i in request.query_params.get("ids", "").split(",") if i]
+        found = [store["products"][i] for i in ids if i in store["products"]]
+        return await respond({"products": [_project(p, request.query_params.get("fields")) for p in found]})
+
+    async def orders(request):
+        params = request.query_params
+        limit = min(int(params.get("limit", 50)), 250)
+        if "page_info" in params:
+            state = _decode_cursor(params["page_info"])
+        elif "email" in params:
+            state = {"email": params["email"], "offset": 0}
+        elif "name" in params:
+            state = {"name": params["name"], "offset": 0}
+        else:
+            state = {"offset": 0}
+        if "email" in state:
+            ids = store["by_email"].get(state["email"], [])
+        elif "name" in state:
+            name = state["name"] if state["name"].startswith("#") else f"#{state['name']}"
+            ids = [store["by_name"][name]] if name in store["by_name"] else []
+        else:
+            ids = list(store["orders"])
+        start = state["offset"]
+        page = [_project(store["orders"][i], params.get("fields")) for i in ids[start:start + limit]]
+        headers = {}
+        if start + limit < len(ids):
+            cursor = _encode_cursor({**state, "offset": start + limit})
+            next_url = request.url.replace(query=f"limit={limit}&page_info={cursor}")
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return await respond({"orders": page}, headers)
+
+    async def stats(request):
+        return JSONResponse(counters)
+
+    prefix = "/admin/api/{version}"
+    app = Starlette(routes=[
+        Route(prefix + "/orders.json", orders),
+        Route(prefix + "/orders/{order_id:int}.json", order),
+        Route(prefix + "/orders/{order_id:int}/fulfillment_orders.json", fulfillment_orders),
+        Route(prefix + "/customers/{customer_id:int}.json", customer),
+        Route(prefix + "/variants/{variant_id:int}.json", variant),
+        Route(prefix + "/products.json", products),
+        Route("/_stats", stats),
+    ])
+    app.state.store = store
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=4, help="line items per order")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--leak-rate", type=float, default=2.0, help="simulated bucket leak rate, requests per second")
+    parser.add_argument("--enforce-bucket", action="store_true", help="return 429 when the simulated bucket is full")
+    args = parser.parse_args()
+    app = create_app(build_store(args.orders, lines=args.lines), args.latency_ms, args.jitter_ms,
+                     args.error_rate, args.throttle_rate, args.enforce_bucket, args.leak_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
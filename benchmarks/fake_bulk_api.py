@@ -0,0 +1,138 @@
+"""
+Local fake of the Shopify GraphQL bulk operation flow for bulk_backfill.py.
+
+Serves, under /admin/api/<version>/graphql.json, the bulkOperationRunQuery
+mutation and the node(id:) status poll, and the finished export as JSONL at
+/bulk/<operation>.jsonl: one record per order followed by its line items as
+child records carrying __parentId, the way Shopify writes bulk results.
+Orders come from fake_admin_api.build_store. The first download can be cut
+off after --fail-after-lines lines to exercise resuming from a checkpoint.
+
+    python benchmarks/fake_bulk_api.py --port 8901 --orders 2000 --fail-after-lines 500
+    SHOPIFY_ADMIN_BASE_URL=http://127.0.0.1:8901/admin/api ORDER_INDEX_PATH=orders.sqlite3 python app/bulk_backfill.py
+"""
+import os
+import sys
+import json
+import argparse
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_admin_api import build_store  # noqa: E402
+
+
+def _gid(kind, legacy_id):
+    return f"gid://shopify/{kind}/{legacy_id}"
+
+
+def bulk_records(store):
+    """The JSONL lines of an orders export, in the order Shopify writes them."""
+    lines = []
+    for order in store["orders"].values():
+        order_gid = _gid("Order", order["id"])
+        lines.append(json.dumps({
+            "id": order_gid,
+            "name": order["name"],
+            "email": order["email"],
+            "createdAt": "2026-09-01T00:00:00Z",
+            "updatedAt": "2026-09-02T00:00:00Z",
+            "processedAt": "2026-09-01T00:00:00Z",
+            "cancelledAt": None,
+            "displayFinancialStatus": "PAID",
+            "displayFulfillmentStatus": "FULFILLED",
+            "tags": [],
+            "currencyCode": order["currency"],
+            "totalPriceSet": {"shopMoney": {"amount": order["total_price"]}},
+            "customer": {"id": _gid("Customer", order["customer"]["id"])},
+            "shippingAddress": {"countryCodeV2": order["shipping_address"]["country_code"]},
+        }))
+        for item in order["line_items"]:
+            lines.append(json.dumps({
+                "id": _gid("LineItem", item["id"]),
+                "name": item["name"],
+                "sku": item["sku"],
+                "quantity": item["quantity"],
+                "currentQuantity": item["current_quantity"],
+                "variant": {"id": _gid("ProductVariant", item["variant_id"])},
+                "__parentId": order_gid,
+            }))
+    return lines
+
+
+def create_app(store, polls_until_complete=1, fail_after_lines=None):
+    """
+    Build the Starlette app. An operation reports RUNNING for its first
+    polls_until_complete polls, then COMPLETED with the result URL. With
+    fail_after_lines the first download stops after that many lines.
+    """
+    lines = bulk_records(store)
+    operations = {}
+    counters = {"runs": 0, "polls": 0, "downloads": 0, "lines_served": 0}
+
+    async def graphql(request):
+        body = await request.json()
+        query = body["query"]
+        if "bulkOperationRunQuery" in query:
+            counters["runs"] += 1
+            operation_id = _gid("BulkOperation", counters["runs"])
+            operations[operation_id] = 0
+            operation = {"id": operation_id, "status": "CREATED"}
+            return JSONResponse({"data": {"bulkOperationRunQuery": {"bulkOperation": operation, "userErrors": []}}})
+        operation_id = body["variables"]["id"]
+        if operation_id not in operations:
+            return JSONResponse({"data": {"node": None}})
+        counters["polls"] += 1
+        operations[operation_id] += 1
+        node = {"id": operation_id, "status": "RUNNING", "errorCode": None, "objectCount": "0", "url": None}
+        if operations[operation_id] > polls_until_complete:
+            node.update(status="COMPLETED", objectCount=str(len(lines)),
+                        url=f"{request.base_url}bulk/{operation_id.rsplit('/', 1)[-1]}.jsonl")
+        return JSONResponse({"data": {"node": node}})
+
+    async def result(request):
+        counters["downloads"] += 1
+        cut = fail_after_lines if counters["downloads"] == 1 else None
+
+        async def stream():
+            for n, line in enumerate(lines):
+                if cut is not None and n >= cut:
+                    raise ConnectionError("result download cut off")
+                counters["lines_served"] += 1
+                yield line + "\n"
+
+        return StreamingResponse(stream(), media_type="application/jsonl")
+
+    async def stats(request):
+        return JSONResponse(counters)
+
+    app = Starlette(routes=[
+        Route("/admin/api/{version}/graphql.json", graphql, methods=["POST"]),
+        Route("/bulk/{operation}.jsonl", result),
+        Route("/_stats", stats),
+    ])
+    app.state.counters = counters
+    app.state.lines = lines
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=4, help="line items per order")
+    parser.add_argument("--polls", type=int, default=1, help="status polls answered RUNNING before COMPLETED")
+    parser.add_argument("--fail-after-lines", type=int, default=None, help="cut the first download off after this many lines")
+    args = parser.parse_args()
+    app = create_app(build_store(args.orders, lines=args.lines), args.polls, args.fail_after_lines)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastmcp.exceptions import ToolError
+from starlette.requests import Request
+
+import admission
+from admission import AdmissionController, client_address
+
+
+def make_request(headers=(), client=("10.0.0.9", 5000)):
+    scope = {
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": client,
+    }
+    return Request(scope)
+
+
+def session_for(monkeypatch, headers):
+    monkeypatch.setattr(admission, "get_http_request", lambda: make_request(headers))
+    return admission.session_key(None)
+
+
+def test_client_address_uses_the_hop_our_proxy_appended():
+    request = make_request([("X-Forwarded-For", "6.6.6.6, 203.0.113.7")])
+    assert client_address(request, trusted_hops=1) == "203.0.113.7"
+    assert client_address(request, trusted_hops=0) == "10.0.0.9"
+
+
+def test_rotating_the_first_forwarded_hop_keeps_the_same_key(monkeypatch):
+    first = session_for(monkeypatch, [("X-Forwarded-For", "1.1.1.1, 203.0.113.7")])
+    second = session_for(monkeypatch, [("X-Forwarded-For", "2.2.2.2, 203.0.113.7")])
+    assert first == second == "address:203.0.113.7"
+
+
+def test_identity_header_separates_clients_behind_one_address(monkeypatch):
+    forwarded = ("X-Forwarded-For", "203.0.113.7")
+    a = session_for(monkeypatch, [forwarded, ("Authorization", "Bearer agent-a")])
+    b = session_for(monkeypatch, [forwarded, ("Authorization", "Bearer agent-b")])
+    assert a != b and a.startswith("identity:") and "agent-a" not in a
+    assert session_for(monkeypatch, [("mcp-session-id", "abc")]) == "session:abc"
+
+
+def test_interactive_calls_go_before_batch_and_session_cap_holds():
+    async def scenario():
+        controller = AdmissionController(global_limit=1, session_limit=1, queue_size=10, queue_timeout=2)
+        order = []
+
+        async def call(session, lane, name):
+            await controller.acquire(session, lane)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release(session, 0.01)
+
+        await asyncio.gather(call("a", "interactive", "first"), call("b", "batch", "batch"),
+                             call("c", "interactive", "interactive"))
+        return order, controller.running, controller.queued()
+
+    assert asyncio.run(scenario()) == (["first", "interactive", "batch"], 0, 0)
+
+
+def test_full_queue_sheds():
+    async def scenario():
+        controller = AdmissionController(global_limit=1, session_limit=0, queue_size=1, queue_timeout=2)
+        await controller.acquire("a", "interactive")
+        waiting = asyncio.ensure_future(controller.acquire("b", "batch"))
+        await asyncio.sleep(0)
+        with pytest.raises(ToolError):
+            await controller.acquire("c", "batch")
+        controller.release("a")
+        await waiting
+        controller.release("b")
+        return controller.running
+
+    assert asyncio.run(scenario()) == 0
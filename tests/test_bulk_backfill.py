@@ -0,0 +1,110 @@
+import json
+import time
+import socket
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+import uvicorn
+
+import bulk_backfill
+import graphql_backend
+from order_index import OrderIndex
+from fake_admin_api import build_store, order_name, customer_email
+from fake_bulk_api import create_app
+
+
+@pytest.fixture
+def bulk_api(monkeypatch):
+    """Run the fake bulk API on a free port and point the GraphQL client at it."""
+    store = build_store(30, lines=2)
+    app = create_app(store, polls_until_complete=1, fail_after_lines=40)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="none"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    monkeypatch.setattr(graphql_backend, "API_BASE", f"http://127.0.0.1:{port}/admin/api")
+    yield app
+    server.should_exit = True
+    thread.join()
+
+
+def backfill(index, checkpoint):
+    return asyncio.run(bulk_backfill.run_backfill(index, str(checkpoint), batch_size=5, poll_interval=0.01))
+
+
+def test_interrupted_backfill_resumes_from_the_checkpoint(bulk_api, tmp_path):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    checkpoint = tmp_path / "checkpoint.json"
+
+    # 30 orders of 3 lines each; the first download is cut off at line 40
+    with pytest.raises(Exception):
+        backfill(index, checkpoint)
+    saved = json.loads(checkpoint.read_text())
+    assert saved["lines_done"] == 30 and saved["orders_done"] == 10
+    assert index.count() == 10
+
+    assert backfill(index, checkpoint) == 30
+    assert not checkpoint.exists()
+    assert index.count() == 30
+    counters = bulk_api.state.counters
+    assert counters["runs"] == 1 and counters["downloads"] == 2
+
+
+def test_summary_rows_are_not_served_as_full_orders(bulk_api, tmp_path):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    with pytest.raises(Exception):
+        backfill(index, tmp_path / "checkpoint.json")
+    backfill(index, tmp_path / "checkpoint.json")
+
+    assert index.get_by_name(order_name(3)) is None
+    assert list(index.iter_orders()) == []
+    summaries = index.find_by_email(customer_email(0), summaries=True)
+    assert [order["name"] for order in summaries] == [order_name(i) for i in (3, 2, 1, 0)]
+    assert index.find_by_email(customer_email(0)) == []
+
+
+def test_updated_at_is_compared_in_utc(tmp_path):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    full = {"id": 1, "name": "#1001", "updated_at": "2026-09-02T10:00:00+10:00", "line_items": []}
+    index.upsert_orders([full])
+
+    # Same instant written with Z: the complete row stays
+    index.upsert_orders([{"id": 1, "name": "#1001", "updated_at": "2026-09-02T00:00:00Z"}], complete=False)
+    assert index.get_by_id(1) == full
+
+    # 09:00+10:00 sorts after 01:00Z as a string but is two hours earlier
+    index.upsert_orders([{"id": 1, "name": "#1001", "updated_at": "2026-09-02T01:00:00Z"}], complete=False)
+    index.upsert_orders([dict(full, updated_at="2026-09-02T09:00:00+10:00")])
+    assert index.get_by_id(1) is None
+    assert index.last_updated_at() == "2026-09-02T01:00:00+00:00"
+
+
+def test_existing_index_is_migrated(tmp_path):
+    path = str(tmp_path / "orders.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, name TEXT, email TEXT COLLATE NOCASE, "
+                 "customer_id INTEGER, updated_at TEXT, payload TEXT NOT NULL)")
+    conn.execute("INSERT INTO orders VALUES (1, '#1001', NULL, NULL, '2026-09-02T10:00:00+10:00', '{\"id\": 1}')")
+    conn.commit()
+    conn.close()
+
+    index = OrderIndex(path)
+    assert index.get_by_id(1) == {"id": 1}
+    assert index.last_updated_at() == "2026-09-02T00:00:00+00:00"
+
+
+def test_graphql_calls_leave_the_rest_bucket_alone(bulk_api, tmp_path):
+    from retry import bucket
+
+    bucket.level = 0.0
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    with pytest.raises(Exception):
+        backfill(index, tmp_path / "checkpoint.json")
+    # A run, three polls and the download; none of them takes a REST slot
+    assert bucket.level == 0.0
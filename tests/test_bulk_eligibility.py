@@ -0,0 +1,54 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from tools import get_eligibility, line_item_discount, process_order_items
+from bulk_eligibility import eligibility_status_codes, flatten_orders, compute_eligibility
+from bench_bulk_eligibility import synthetic_orders
+from bench_process_order_items import synthetic_order
+
+
+def scalar_rows(orders, variant_prices=None):
+    return [row for order in orders for row in process_order_items(order, {}, 1, variant_prices)]
+
+
+def test_status_codes_match_get_eligibility_across_the_boundaries():
+    cases = list(itertools.product(
+        [False, True],
+        [None, 0, 29, 30, 31, 400],
+        [0, 10, 20, 21, 60],
+        [False, True],
+        ['Normal', 'Klarna', 'Store Credits'],
+    ))
+    expected = [get_eligibility(f, d, p, h, 1, m, "AU")[0] for f, d, p, h, m in cases]
+    final_sale, days, pct, has_discount, method = zip(*cases)
+    days = [np.nan if d is None else d for d in days]
+    assert list(eligibility_status_codes(final_sale, days, pct, has_discount, method)) == expected
+
+
+@pytest.mark.parametrize("with_variant_prices", [False, True])
+def test_synthetic_orders_match_process_order_items(with_variant_prices):
+    orders, variant_prices = synthetic_orders(400)
+    variant_prices = variant_prices if with_variant_prices else None
+    expected = scalar_rows(orders, variant_prices)
+    frame = compute_eligibility(flatten_orders(orders, variant_prices))
+    assert frame["eligibility_status"].tolist() == [row["eligibility_status"] for row in expected]
+    assert frame["discount_pct"].tolist() == [row["discount_percentage"] for row in expected]
+
+
+def test_discount_amount_without_percentage_is_a_zero_percent_discount():
+    properties = [{"name": "_Discount_Amount", "value": "15"}]
+    assert line_item_discount(properties) == (15.0, 0, True)
+    assert line_item_discount(properties + [{"name": "_Discount_Percentage", "value": "25%"}]) == (15.0, 25, True)
+    assert line_item_discount([{"name": "_Discount_Amount", "value": "0"}]) == (0, 0, False)
+
+    order = synthetic_order(3)
+    for item in order["line_items"]:
+        item["properties"] = list(properties)
+    order.update(id=1, name="#1")
+    expected = scalar_rows([order])
+    frame = compute_eligibility(flatten_orders([order]))
+    assert [row["discount_percentage"] for row in expected] == frame["discount_pct"].tolist() == [0, 0, 0]
+    assert frame["has_discount"].all()
+    assert frame["eligibility_status"].tolist() == [row["eligibility_status"] for row in expected]
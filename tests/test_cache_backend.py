@@ -0,0 +1,130 @@
+import time
+import asyncio
+import fnmatch
+
+import cache_backend
+from cache import ResponseCache, MISSING
+from cache_backend import RedisBackend, SQLiteBackend
+
+
+class StubRedis:
+    """In-memory stand-in for the slice of the redis-py client RedisBackend uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] <= time.time():
+            del self.data[key]
+            entry = None
+        return entry
+
+    def get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def pttl(self, key):
+        entry = self._live(key)
+        return int((entry[1] - time.time()) * 1000) if entry else -2
+
+    def set(self, key, value, px):
+        assert isinstance(value, bytes)
+        self.data[key] = (value, time.time() + px / 1000)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match, count):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+    def pipeline(self, transaction=False):
+        return StubPipeline(self)
+
+    def close(self):
+        pass
+
+
+class StubPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append((self.client.get, key))
+
+    def pttl(self, key):
+        self.calls.append((self.client.pttl, key))
+
+    def execute(self):
+        return [method(key) for method, key in self.calls]
+
+
+class BrokenBackend:
+    def get(self, key):
+        raise ConnectionError("backend down")
+
+    set = delete = get
+
+
+def test_status_map_keys_survive_serialization():
+    status_map = {500000000300: "open", 500000000301: "closed"}
+    assert cache_backend.decode("fulfillment", cache_backend.encode(status_map)) == status_map
+    eligibility = ({"id": 1}, status_map, 3)
+    assert cache_backend.decode("eligibility", cache_backend.encode(eligibility)) == eligibility
+
+
+def test_redis_backend_shares_entries_between_caches():
+    client = StubRedis()
+    writer = ResponseCache(backend=RedisBackend(client=client))
+    reader = ResponseCache(backend=RedisBackend(client=client))
+    writer.set("fulfillment", 1, {11: "open", 12: "closed"})
+    writer.set("order", 5, {"id": 5, "name": "#1001"})
+    writer.flush()
+
+    assert reader.get("order", 5) is MISSING  # the sync path never waits on the backend
+    assert asyncio.run(reader.aget("fulfillment", 1)) == {11: "open", 12: "closed"}
+    assert asyncio.run(reader.aget("order", "5")) == {"id": 5, "name": "#1001"}
+    assert reader.stats()["backend_hits"] == {"fulfillment": 1, "order": 1}
+
+    writer.invalidate("order", 5)
+    writer.flush()
+    reader.clear()
+    assert asyncio.run(reader.aget("order", 5)) is MISSING
+    assert writer.backend.count() == 1
+
+
+def test_redis_backend_respects_ttl():
+    client = StubRedis()
+    cache = ResponseCache(ttls={"fulfillment": 0.05}, backend=RedisBackend(client=client))
+    cache.set("fulfillment", 1, {11: "open"})
+    cache.flush()
+    time.sleep(0.1)
+    assert asyncio.run(cache.aget("fulfillment", 1)) is MISSING
+
+
+def test_sqlite_backend_survives_a_new_process(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = ResponseCache(backend=SQLiteBackend(path))
+    first.set("eligibility", 7, ({"id": 7}, {71: "open"}, 2))
+    first.flush()
+
+    second = ResponseCache(backend=SQLiteBackend(path))
+    assert asyncio.run(second.aget("eligibility", 7)) == ({"id": 7}, {71: "open"}, 2)
+
+
+def test_backend_failures_are_misses():
+    cache = ResponseCache(backend=BrokenBackend())
+    cache.set("order", 1, {"id": 1})
+    cache.flush()
+    assert asyncio.run(cache.aget("order", 1)) == {"id": 1}
+    assert asyncio.run(cache.aget("order", 2)) is MISSING
+    assert cache.stats()["backend_errors"] == 2
+
+
+def test_unserializable_value_does_not_break_set():
+    cache = ResponseCache(backend=RedisBackend(client=StubRedis()))
+    cache.set("order", 1, {"id": 1, "tags": {"a"}}, size=10)
+    cache.flush()
+    assert cache.get("order", 1) == {"id": 1, "tags": {"a"}}
+    assert cache.stats()["backend_errors"] == 1
@@ -0,0 +1,73 @@
+import fcntl
+import asyncio
+
+import order_index
+from order_index import OrderIndex
+
+
+def test_only_the_lock_holder_runs_the_sync(tmp_path, monkeypatch):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    monkeypatch.setattr(order_index, "_index", index)
+    monkeypatch.setattr(order_index, "_sync_task", None)
+    monkeypatch.setattr(order_index, "_sync_lock", None)
+    monkeypatch.setattr(order_index, "_sync_lock_checked", float("-inf"))
+
+    # Another worker holds the lock
+    other = open(f"{index.path}.sync.lock", "w")
+    fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    async def attempt():
+        order_index.ensure_sync_task()
+        task = order_index._sync_task
+        if task is not None:
+            task.cancel()
+        return task
+
+    assert asyncio.run(attempt()) is None
+    other.close()
+    monkeypatch.setattr(order_index, "_sync_lock_checked", float("-inf"))
+    assert asyncio.run(attempt()) is not None
+    order_index._sync_lock.close()
+
+
+def test_webhook_rows_do_not_move_the_sync_watermark(tmp_path, monkeypatch):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    seen = []
+
+    async def fake_backfill(index, updated_at_min=None):
+        seen.append(updated_at_min)
+        return 0
+
+    monkeypatch.setattr(order_index, "backfill", fake_backfill)
+    index.set_meta(order_index.SYNC_WATERMARK, "2026-09-01T00:00:00+00:00")
+    # An orders/updated webhook for a recent order
+    index.upsert_orders([{"id": 1, "name": "#1001", "updated_at": "2026-10-01T00:00:00Z"}])
+
+    asyncio.run(order_index.sync_incremental(index))
+    assert seen == ["2026-09-01T00:00:00+00:00"]
+    assert index.get_meta(order_index.SYNC_WATERMARK) > "2026-10-01"
+
+
+def test_email_search_pages_through_the_index(tmp_path, monkeypatch):
+    import main
+    from fastmcp import Client
+
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    index.upsert_orders([{"id": i, "name": f"#{1000 + i}", "email": "a@example.com"} for i in range(5)])
+    monkeypatch.setattr(main, "get_index", lambda: index)
+    monkeypatch.setattr(main, "ensure_sync_task", lambda: None)
+
+    async def pages():
+        names, cursor = [], None
+        async with Client(main.mcp) as client:
+            while True:
+                args = {"email": "a@example.com", "max_results": 2}
+                if cursor:
+                    args["cursor"] = cursor
+                result = (await client.call_tool("search_orders_by_email", args)).structured_content
+                names.append([order["name"] for order in result["orders"]])
+                cursor = result["next_cursor"]
+                if cursor is None:
+                    return names
+
+    assert asyncio.run(pages()) == [["#1004", "#1003"], ["#1002", "#1001"], ["#1000"]]
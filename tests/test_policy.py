@@ -0,0 +1,20 @@
+import os
+import shutil
+
+import policy
+
+
+def test_missing_policy_file_keeps_the_loaded_policy(tmp_path):
+    path = str(tmp_path / "return_policy.json")
+    shutil.copy(policy.POLICY_PATH, path)
+    store = policy.PolicyStore(path)
+    loaded = store.get()
+
+    os.remove(path)
+    store._reload_if_changed()
+    assert store.get() is loaded
+
+    shutil.copy(policy.POLICY_PATH, path)
+    os.utime(path, (0, 12345))
+    store._reload_if_changed()
+    assert store.get() is not loaded and store.get().version == 12345
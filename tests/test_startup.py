@@ -0,0 +1,24 @@
+import os
+import sys
+import subprocess
+
+from bench_startup import APP_DIR, IMPORT_LINE
+
+# Loaded only by init_shopify, the sync helpers and the bulk reports, never on the serving path
+HEAVY_MODULES = {"shopify", "requests", "pandas", "numpy"}
+# Generous for a cold CI runner; `import main` takes well under two seconds locally
+MAX_IMPORT_SECONDS = float(os.getenv("STARTUP_MAX_IMPORT_SECONDS", "5"))
+
+
+def test_import_main_stays_light():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=APP_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imported[match[4]] = int(match[2])
+
+    assert HEAVY_MODULES.isdisjoint(imported), sorted(HEAVY_MODULES & set(imported))
+    assert imported["main"] / 1e6 < MAX_IMPORT_SECONDS
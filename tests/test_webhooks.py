@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import webhooks
+from cache import ResponseCache, MISSING
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    fresh = ResponseCache()
+    monkeypatch.setattr(webhooks, "cache", fresh)
+    monkeypatch.setattr(webhooks, "get_index", lambda: None)
+    return fresh
+
+
+def apply(topic, payload):
+    return asyncio.run(webhooks.apply_webhook(topic, payload))
+
+
+def test_late_order_update_does_not_replace_a_newer_copy(cache):
+    newer = {"id": 1, "name": "#1001", "updated_at": "2026-10-01T12:00:00+10:00", "tags": "new"}
+    older = {"id": 1, "name": "#1001", "updated_at": "2026-10-01T01:30:00Z", "tags": "old"}
+    apply("orders/updated", newer)
+    assert apply("orders/updated", older).startswith("skipped")
+    assert cache.get("order", 1)["tags"] == "new"
+
+    # 03:00Z is later than 12:00+10:00 (02:00Z) even though the string sorts lower
+    latest = dict(older, updated_at="2026-10-01T03:00:00Z", tags="latest")
+    apply("orders/updated", latest)
+    assert cache.get("order", 1)["tags"] == "latest"
+
+
+def test_customer_update_drops_eligibility_for_their_orders(cache):
+    order = {"id": 7, "name": "#1007", "customer": {"id": 42}}
+    cache.set("order", 7, order)
+    cache.set("eligibility", 7, (order, {}, 3))
+    cache.set("eligibility", 8, ({"id": 8, "customer": {"id": 99}}, {}, 1))
+    cache.set("eligibility", 9, ({"id": 9, "customer": {"id": 42}}, {}, 3))
+
+    apply("customers/update", {"id": 42, "orders_count": 4, "updated_at": "2026-10-01T00:00:00Z"})
+    assert cache.get("eligibility", 7) is MISSING
+    assert cache.get("eligibility", 9) is MISSING
+    assert cache.get("eligibility", 8) is not MISSING
+    assert cache.get("customer", 42)["orders_count"] == 4
+
+
+def test_fulfillment_and_refund_events_stop_the_index_serving_the_order(cache, monkeypatch, tmp_path):
+    from order_index import OrderIndex
+
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    monkeypatch.setattr(webhooks, "get_index", lambda: index)
+    order = {"id": 5, "name": "#1005", "updated_at": "2026-10-01T00:00:00Z", "fulfillments": []}
+    for topic, payload in [("fulfillments/update", {"id": 50, "order_id": 5}),
+                           ("refunds/create", {"id": 51, "order_id": 5})]:
+        index.upsert_orders([order])
+        assert index.get_by_name("#1005") == order
+        apply(topic, payload)
+        assert index.get_by_name("#1005") is None
+
+    # The next full copy makes the row servable again
+    index.upsert_orders([order])
+    assert index.get_by_id(5) == order